@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+import yt_dlp.version
+from config import DEFAULTS
+from downloader import AUDIO_FORMATS, VIDEO_FORMATS
+from standin_media import CONTENT_TYPES, build_media
+from standin_server import StandinServer
+
+try:
+    import resource
+except ImportError:
+    # Windows: sin getrusage solo se mide el tiempo de CPU del propio proceso
+    resource = None
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+VIDEO_ID = 'bench'
+DELIVERIES = ('dash', 'hls', 'progressive', 'all')
+
+
+def _rss_mb(maxrss: int) -> float:
+    # ru_maxrss va en KB en Linux y en bytes en macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return round(maxrss * scale / (1024 * 1024), 1)
+
+
+def _usage() -> dict:
+    usage = {'cpu': time.process_time()}
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        usage['children_cpu'] = children.ru_utime + children.ru_stime
+        # El máximo de los hijos no sirve: tras fork heredan el del padre
+        usage['peak_rss_mb'] = _rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    return usage
+
+
+def run_case(case: dict) -> dict:
+    # Se ejecuta en un proceso aparte por caso: memoria, CPU y cachés no se mezclan entre casos.
+    # Mismo recorrido que la interfaz: búsqueda (get_video_info) y descarga con esa extracción
+    import downloader
+
+    marks = {}
+
+    def on_progress(percentage, speed):
+        now = time.perf_counter()
+        marks.setdefault('first_progress', now)
+        if percentage >= 100:
+            # La última descarga terminada: lo que queda hasta el final es postproceso
+            marks['downloaded'] = now
+
+    before = _usage()
+    start = time.perf_counter()
+    downloader.get_video_info(case['url'])
+    extracted = time.perf_counter()
+    result = downloader.download_video(case['url'], case['quality'], case['format'],
+                                       case['output_path'], progress_callback=on_progress)
+    end = time.perf_counter()
+    after = _usage()
+
+    downloaded = marks.get('downloaded', end)
+    stats = {
+        'ok': bool(result and result.get('file_path')),
+        'total_seconds': round(end - start, 3),
+        'extract_seconds': round(extracted - start, 3),
+        'first_byte_seconds': round(marks.get('first_progress', end) - extracted, 3),
+        'download_seconds': round(downloaded - extracted, 3),
+        'postprocess_seconds': round(end - downloaded, 3),
+        'cpu_seconds': round(after['cpu'] - before['cpu'], 3),
+        'output_mb': result and result.get('size_mb'),
+        'transcoded': result and result.get('transcoded'),
+        'selected_format': result and (result.get('plan') or {}).get('format'),
+    }
+    if 'children_cpu' in after:
+        stats['ffmpeg_cpu_seconds'] = round(after['children_cpu'] - before['children_cpu'], 3)
+        stats['peak_rss_mb'] = after['peak_rss_mb']
+    return stats
+
+
+def _spawn_case(case: dict, workdir: str, settings: dict, ffmpeg_dir: str) -> dict:
+    # Cada caso con su propia carpeta de datos: sin archivo de descargas ni caché de otro caso
+    appdata = os.path.join(workdir, 'appdata')
+    os.makedirs(os.path.join(appdata, 'YouTubeDownloader'), exist_ok=True)
+    os.makedirs(case['output_path'], exist_ok=True)
+    with open(os.path.join(appdata, 'YouTubeDownloader', 'config.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(settings, f)
+    env = dict(os.environ, LOCALAPPDATA=appdata)
+    if ffmpeg_dir:
+        env['PATH'] = ffmpeg_dir + os.pathsep + env.get('PATH', '')
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                          env=env, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    errors = proc.stderr.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {'ok': False, 'error': errors[-1] if errors else f"código {proc.returncode}"}
+    stats = json.loads(lines[-1])
+    if not stats['ok'] and errors:
+        # download_video informa del error por stderr y devuelve None
+        stats['error'] = errors[-1]
+    return stats
+
+
+def _git_commit() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if dirty else '')
+
+
+def _parse_setting(value: str):
+    key, sep, raw = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError("se espera clave=valor")
+    try:
+        return key, json.loads(raw)
+    except ValueError:
+        return key, raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de extracción, descarga y postproceso por formato contra un servidor local")
+    parser.add_argument("--formats", default=','.join(AUDIO_FORMATS + VIDEO_FORMATS))
+    parser.add_argument("--delivery", default="dash",
+                        help=f"entrega que anuncia el extractor: {', '.join(DELIVERIES)} (separadas por comas)")
+    parser.add_argument("--duration", type=int, default=20, help="segundos del vídeo sintético")
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--latency-ms", type=int, default=0, help="latencia de cada petición")
+    parser.add_argument("--per-connection-kbps", type=int, default=0,
+                        help="límite de cada conexión en KB/s (0 = sin límite)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--quality-audio", default=DEFAULTS['default_quality_audio'])
+    parser.add_argument("--quality-video", default=DEFAULTS['default_quality_video'])
+    parser.add_argument("--set", type=_parse_setting, action='append', default=[],
+                        metavar="CLAVE=VALOR", help="opción de config.json para los casos (valor en JSON)")
+    parser.add_argument("--ffmpeg", help="carpeta con ffmpeg y ffprobe (por defecto, el PATH)")
+    parser.add_argument("--output", help=f"archivo de resultados (por defecto {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))), flush=True)
+        return 0
+
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    deliveries = [d.strip() for d in args.delivery.split(',') if d.strip()]
+    unknown = [f for f in formats if f not in AUDIO_FORMATS + VIDEO_FORMATS]
+    unknown += [d for d in deliveries if d not in DELIVERIES]
+    if unknown:
+        parser.error(f"desconocido: {', '.join(unknown)}")
+    ffmpeg = shutil.which('ffmpeg', path=args.ffmpeg) if args.ffmpeg else shutil.which('ffmpeg')
+    if not ffmpeg:
+        parser.error("no se encuentra ffmpeg (usa --ffmpeg)")
+
+    commit = _git_commit()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        media = build_media(os.path.join(tmp, 'media'), VIDEO_ID, ffmpeg, args.duration,
+                            args.height)
+        server = StandinServer(latency=args.latency_ms / 1000,
+                               per_connection_bps=args.per_connection_kbps * 1024)
+        server.add_directory(f'/media/{VIDEO_ID}', media, CONTENT_TYPES)
+        with server:
+            number = 0
+            for delivery in deliveries:
+                for output_format in formats:
+                    quality = args.quality_audio if output_format in AUDIO_FORMATS else args.quality_video
+                    for run in range(args.repeat):
+                        number += 1
+                        workdir = os.path.join(tmp, f'case-{number}')
+                        case = {
+                            'url': server.url(f'/watch/{delivery}/{VIDEO_ID}'),
+                            'format': output_format,
+                            'quality': quality,
+                            'output_path': os.path.join(workdir, 'out'),
+                        }
+                        sent, requests = server.bytes_sent, server.requests
+                        stats = _spawn_case(case, workdir, dict(args.set), args.ffmpeg)
+                        stats = {'delivery': delivery, 'format': output_format, 'quality': quality,
+                                 'run': run, **stats,
+                                 'bytes': server.bytes_sent - sent,
+                                 'requests': server.requests - requests}
+                        if stats.get('download_seconds'):
+                            stats['throughput_mbps'] = round(
+                                stats['bytes'] / stats['download_seconds'] / (1024 * 1024), 2)
+                        shutil.rmtree(workdir, ignore_errors=True)
+                        results.append(stats)
+                        print(json.dumps(stats), flush=True)
+
+    report = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': {k: v for k, v in vars(args).items() if k != 'case'},
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados en {output}", file=sys.stderr)
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
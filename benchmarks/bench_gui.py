@@ -0,0 +1,357 @@
+import argparse
+import heapq
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+sys.path.insert(0, BENCH_DIR)
+from bench_formats import RESULTS_DIR, _git_commit
+from standin_server import StandinServer
+
+CASES = ('history', 'thumbnails', 'progress')
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _fake_entry(i: int) -> dict:
+    return {
+        'title': f'Vídeo de prueba {i}',
+        'format': ('MP4', 'MP3', 'MKV', 'FLAC')[i % 4],
+        'quality': '720p',
+        'size_mb': round(5 + i % 50 * 0.7, 2),
+        'elapsed_seconds': 3.2,
+        'output_path': '/tmp/descargas',
+        'file_path': f'/tmp/descargas/Vídeo de prueba {i}.mp4',
+        'thumbnail_url': f'http://127.0.0.1/vi/{i:011d}/mqdefault.jpg',
+        'video_id': f'standin:{i:011d}',
+        'date': '01/01/2026 12:00',
+    }
+
+
+def _virtual_list_layout(entries: int, steps: int):
+    # Con pantalla: la lista real de la interfaz (CustomTkinter) desplazándose de arriba abajo
+    try:
+        import customtkinter as ctk
+        from history import count_history, query_history, history_anchor
+        from virtual_list import VirtualList
+        root = ctk.CTk()
+    except Exception:
+        return None
+    try:
+        root.geometry("900x600")
+
+        def create_row(parent):
+            frame = ctk.CTkFrame(parent, height=100)
+            frame.grid_propagate(False)
+            return {'frame': frame, 'title': ctk.CTkLabel(frame, text="")}
+
+        def bind_row(row, entry):
+            row['title'].configure(text=entry['title'])
+
+        vlist = VirtualList(root, 110, create_row, bind_row, count_history, query_history,
+                            history_anchor)
+        vlist.pack(fill="both", expand=True)
+        root.update()
+        start = time.perf_counter()
+        vlist.refresh()
+        root.update_idletasks()
+        refresh = time.perf_counter() - start
+        times = []
+        bottom = entries * 110
+        for i in range(steps):
+            start = time.perf_counter()
+            vlist.scroll_to(bottom * i / max(1, steps - 1))
+            root.update_idletasks()
+            times.append(time.perf_counter() - start)
+        return {'refresh_ms': _ms(refresh), 'layout_ms': _ms(statistics.median(times))}
+    finally:
+        root.destroy()
+
+
+def run_history(entries: int, steps: int = 200) -> dict:
+    # Lo que hace la pestaña Historial: total + primera página al abrir, una página por clave
+    # al desplazarse de arriba abajo y, al saltar con la barra, la búsqueda del id de destino
+    import history
+
+    for i in range(entries):
+        history.save_entry(_fake_entry(i))
+    start = time.perf_counter()
+    total = history.count_history()
+    page = history.query_history(None, 50)
+    open_time = time.perf_counter() - start
+    times = []
+    while len(page) == 50:
+        start = time.perf_counter()
+        page = history.query_history(page[-1]['id'], 50)
+        times.append(time.perf_counter() - start)
+    jumps = []
+    for i in range(1, steps):
+        offset = (total - 50) * i // max(1, steps - 1)
+        start = time.perf_counter()
+        history.history_anchor(None, offset)
+        jumps.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    history.count_history(search='prueba 1', fmt='mp4')
+    search = time.perf_counter() - start
+    stats = {'open_ms': _ms(open_time), 'page_ms': _ms(statistics.median(times or [0])),
+             'jump_ms': _ms(statistics.median(jumps or [0])), 'search_ms': _ms(search)}
+    layout = _virtual_list_layout(entries, steps)
+    stats.update(layout or {'refresh_ms': None, 'layout_ms': None})
+    return stats
+
+
+def _jpeg(i: int) -> bytes:
+    from PIL import Image
+    img = Image.new('RGB', (480, 360), ((i * 37) % 256, (i * 91) % 256, (i * 13) % 256))
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def run_thumbnails(count: int, latency_ms: int) -> dict:
+    # Miniaturas del historial (96x54) desde el servidor local: en frío (red + decodificación),
+    # desde la caché de disco (otro arranque) y desde la de memoria
+    from thumb_cache import ThumbnailCache
+    from thumb_select import HISTORY_SIZE
+    from thumbnails import ThumbnailLoader
+
+    server = StandinServer(latency=latency_ms / 1000)
+    for i in range(count):
+        server.add_file(f'/vi/{i:011d}/hqdefault.jpg', _jpeg(i), 'image/jpeg')
+    cache_dir = tempfile.mkdtemp(prefix='thumbs-')
+
+    def load_all(cache) -> float:
+        done = threading.Semaphore(0)
+        loader = ThumbnailLoader(lambda ms, fn: fn(), cache=cache)
+        start = time.perf_counter()
+        for i in range(count):
+            loader.request(server.url(f'/vi/{i:011d}/hqdefault.jpg'), *HISTORY_SIZE,
+                           lambda img: done.release())
+        for _ in range(count):
+            if not done.acquire(timeout=30):
+                raise RuntimeError("Miniaturas sin entregar")
+        return time.perf_counter() - start
+
+    with server:
+        cache = ThumbnailCache(cache_dir, disk_budget=100 * 1024 * 1024)
+        cold = load_all(cache)
+        requests = server.requests
+        disk = load_all(ThumbnailCache(cache_dir, disk_budget=100 * 1024 * 1024))
+        memory = load_all(cache)
+        network_requests = server.requests - requests
+    return {
+        'cold_ms_per_thumbnail': _ms(cold / count),
+        'disk_ms_per_thumbnail': _ms(disk / count),
+        'memory_ms_per_thumbnail': _ms(memory / count),
+        # Peticiones al servidor con la caché caliente (deberían ser 0)
+        'warm_requests': network_requests,
+    }
+
+
+class _FakeTk:
+    # Bucle de eventos con after(): un hilo ejecuta las llamadas cuando toca, como Tk.after
+    def __init__(self):
+        self._queue = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._stopped = False
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def after(self, ms: int, fn):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._queue, (time.perf_counter() + ms / 1000, self._seq, fn))
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.thread.join()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (
+                        not self._queue or self._queue[0][0] > time.perf_counter()):
+                    timeout = self._queue[0][0] - time.perf_counter() if self._queue else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                _, _, fn = heapq.heappop(self._queue)
+            fn()
+
+
+def run_progress(jobs: int, hook_hz: int, seconds: float) -> dict:
+    # Hooks de yt-dlp de varios trabajos a la vez contra el bus de progreso: coste de publicar,
+    # cuántas entregas llegan al hilo de la interfaz y cuánto tarda en verse cada actualización
+    from job_queue import Job, RUNNING
+    from progress_bus import ProgressBus
+
+    tk = _FakeTk()
+    # Primera actualización de cada trabajo aún sin entregar: el retraso se mide desde ahí
+    waiting = {}
+    latencies = []
+    deliveries = [0]
+
+    def deliver(job, stats):
+        deliveries[0] += 1
+        sent = waiting.pop(job.id, None)
+        if sent is not None:
+            latencies.append(time.perf_counter() - sent)
+
+    bus = ProgressBus(tk.after, deliver)
+    publish_times = []
+    lock = threading.Lock()
+
+    def publisher(job):
+        job.state = RUNNING
+        interval = 1 / hook_hz
+        own = []
+        end = time.perf_counter() + seconds
+        step = 0
+        while time.perf_counter() < end:
+            step += 1
+            job.progress = min(99.0, step * 100 / (hook_hz * seconds))
+            job.speed = 1024 * 1024
+            start = time.perf_counter()
+            waiting.setdefault(job.id, start)
+            bus.publish(job)
+            own.append(time.perf_counter() - start)
+            time.sleep(interval)
+        with lock:
+            publish_times.extend(own)
+
+    threads = [threading.Thread(target=publisher, args=(Job(f'http://127.0.0.1/{i}', '720p',
+                                                              'mp4', '/tmp'),))
+               for i in range(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(2 * bus.interval_ms / 1000)
+    tk.stop()
+    return {
+        'events': len(publish_times),
+        'deliveries': deliveries[0],
+        'publish_us': round(statistics.median(publish_times) * 1e6, 2),
+        'latency_ms': _ms(statistics.median(latencies)) if latencies else None,
+    }
+
+
+def run_case(case: dict) -> dict:
+    # En un proceso aparte con su propio LOCALAPPDATA (historial y cachés vacíos)
+    start = time.perf_counter()
+    try:
+        if case['case'] == 'history':
+            stats = run_history(case['entries'])
+        elif case['case'] == 'thumbnails':
+            stats = run_thumbnails(case['count'], case['latency_ms'])
+        else:
+            stats = run_progress(case['jobs'], case['hook_hz'], case['seconds'])
+        stats['ok'] = True
+    except Exception as e:
+        stats = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    stats['total_seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def _spawn_case(case: dict, workdir: str) -> dict:
+    os.makedirs(workdir, exist_ok=True)
+    env = dict(os.environ, LOCALAPPDATA=workdir)
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                          env=env, capture_output=True, text=True)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {'ok': False, 'error': proc.stderr.strip()[-500:] or f"salida {proc.returncode}"}
+
+
+def _cases(args) -> list:
+    cases = []
+    for name in args.cases:
+        if name == 'history':
+            cases += [({'case': name, 'entries': n}, str(n)) for n in args.history_entries]
+        elif name == 'thumbnails':
+            cases.append(({'case': name, 'count': args.thumbnails,
+                           'latency_ms': args.latency_ms}, str(args.thumbnails)))
+        else:
+            cases.append(({'case': name, 'jobs': args.jobs, 'hook_hz': args.hook_hz,
+                           'seconds': args.seconds}, f"{args.jobs}x{args.hook_hz}Hz"))
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks de la interfaz sin pantalla: historial, miniaturas y progreso")
+    parser.add_argument("--cases", default=','.join(CASES), help=f"de entre {', '.join(CASES)}")
+    parser.add_argument("--history-entries", default="1000,10000,50000",
+                        help="tamaños del historial, separados por comas")
+    parser.add_argument("--thumbnails", type=int, default=200, help="miniaturas distintas")
+    parser.add_argument("--latency-ms", type=int, default=20,
+                        help="latencia del servidor de miniaturas")
+    parser.add_argument("--jobs", type=int, default=8, help="trabajos publicando progreso")
+    parser.add_argument("--hook-hz", type=int, default=200, help="hooks por segundo y trabajo")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duración del caso de progreso")
+    parser.add_argument("--repeat", type=int, default=1, help="repeticiones de cada caso")
+    parser.add_argument("--output",
+                        help=f"archivo de resultados (por defecto {RESULTS_DIR}/<commit>-gui.json)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))), flush=True)
+        return 0
+
+    args.cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        parser.error(f"desconocido: {', '.join(unknown)}")
+    args.history_entries = [int(n) for n in args.history_entries.split(',') if n.strip()]
+
+    commit = _git_commit()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        number = 0
+        for case, size in _cases(args):
+            for run in range(args.repeat):
+                number += 1
+                stats = _spawn_case(case, os.path.join(tmp, f'case-{number}'))
+                # Mismas claves que bench_formats.py: compare.py compara ambos
+                stats = {'delivery': 'gui', 'format': case['case'], 'quality': size,
+                         'run': run, **stats}
+                results.append(stats)
+                print(json.dumps(stats), flush=True)
+
+    report = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': {k: v for k, v in vars(args).items() if k != 'case'},
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}-gui.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados en {output}", file=sys.stderr)
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
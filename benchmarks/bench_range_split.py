@@ -0,0 +1,51 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+from range_download import RangeDownloader
+from standin_server import StandinServer, synthetic_bytes
+
+
+def run_case(server, url, path, connections, expected_digest):
+    stats = RangeDownloader(url, path, connections=connections).download()
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    stats['throughput_mbps'] = round(stats['bytes'] / stats['elapsed'] / (1024 * 1024), 2)
+    stats['verified'] = digest == expected_digest
+    stats['requested_connections'] = connections
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de descarga por rangos contra un servidor local")
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--per-connection-kbps", type=int, default=2048,
+                        help="límite de cada conexión en KB/s")
+    parser.add_argument("--connections", default="1,2,4,8")
+    args = parser.parse_args(argv)
+
+    content = synthetic_bytes(args.size_mb * 1024 * 1024)
+    expected = hashlib.sha256(content).hexdigest()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for support_ranges in (True, False):
+            server = StandinServer(per_connection_bps=args.per_connection_kbps * 1024,
+                                   support_ranges=support_ranges)
+            server.add_file('/media.bin', content)
+            with server:
+                for connections in [int(c) for c in args.connections.split(',')]:
+                    stats = run_case(server, server.url('/media.bin'),
+                                     os.path.join(tmp, 'media.bin'), connections, expected)
+                    stats['server_ranges'] = support_ranges
+                    results.append(stats)
+                    print(json.dumps(stats), flush=True)
+    return 0 if all(r['verified'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
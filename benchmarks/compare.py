@@ -0,0 +1,101 @@
+import argparse
+import json
+import statistics
+import sys
+
+# Métrica -> (mayor es mejor, diferencia absoluta por debajo de la cual se considera ruido)
+METRICS = {
+    'total_seconds': (False, 0.05),
+    'extract_seconds': (False, 0.05),
+    'first_byte_seconds': (False, 0.05),
+    'download_seconds': (False, 0.05),
+    'postprocess_seconds': (False, 0.05),
+    'cpu_seconds': (False, 0.05),
+    'ffmpeg_cpu_seconds': (False, 0.05),
+    'peak_rss_mb': (False, 2),
+    'throughput_mbps': (True, 0.1),
+    # bench_gui.py
+    'open_ms': (False, 1),
+    'page_ms': (False, 0.5),
+    'jump_ms': (False, 0.5),
+    'search_ms': (False, 1),
+    'refresh_ms': (False, 2),
+    'layout_ms': (False, 1),
+    'cold_ms_per_thumbnail': (False, 1),
+    'disk_ms_per_thumbnail': (False, 0.5),
+    'memory_ms_per_thumbnail': (False, 0.1),
+    'publish_us': (False, 2),
+    'latency_ms': (False, 5),
+}
+
+
+def _load(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _medians(report: dict) -> dict:
+    # Mediana de las repeticiones de cada caso (entrega, formato, calidad)
+    runs = {}
+    for result in report['results']:
+        if not result.get('ok'):
+            continue
+        key = (result['delivery'], result['format'], result['quality'])
+        runs.setdefault(key, []).append(result)
+    return {
+        key: {metric: statistics.median(r[metric] for r in results)
+              for metric in METRICS if all(r.get(metric) is not None for r in results)}
+        for key, results in runs.items()
+    }
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    rows = []
+    base_medians, new_medians = _medians(base), _medians(new)
+    for key in sorted(set(base_medians) & set(new_medians)):
+        for metric, (higher_better, noise) in METRICS.items():
+            before = base_medians[key].get(metric)
+            after = new_medians[key].get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = after < before if higher_better else after > before
+            rows.append({
+                'delivery': key[0], 'format': key[1], 'quality': key[2], 'metric': metric,
+                'base': before, 'new': after, 'change_pct': round(change, 1),
+                'regression': worse and abs(change) > threshold and abs(after - before) > noise,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de bench_formats.py o bench_gui.py")
+    parser.add_argument("base", help="resultados de referencia (p. ej. el commit anterior)")
+    parser.add_argument("new", help="resultados a comparar")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="porcentaje de empeoramiento que cuenta como regresión")
+    parser.add_argument("--json", action="store_true", help="una línea JSON por métrica")
+    args = parser.parse_args(argv)
+
+    base, new = _load(args.base), _load(args.new)
+    rows = compare(base, new, args.threshold)
+    if args.json:
+        for row in rows:
+            print(json.dumps(row))
+    else:
+        print(f"{base['commit']} -> {new['commit']}")
+        for row in rows:
+            mark = '  REGRESIÓN' if row['regression'] else ''
+            case = f"{row['delivery']}/{row['format']}/{row['quality']}"
+            print(f"{case:<32} {row['metric']:<20} {row['base']:>10} {row['new']:>10} "
+                  f"{row['change_pct']:>+7.1f}%{mark}")
+    # Casos que funcionaban y ahora fallan también son regresiones
+    attempted = {(r['delivery'], r['format'], r['quality']) for r in new['results']}
+    broken = sorted((set(_medians(base)) & attempted) - set(_medians(new)))
+    for key in broken:
+        print(f"{'/'.join(key)}: ya no termina", file=sys.stderr)
+    return 1 if broken or any(row['regression'] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
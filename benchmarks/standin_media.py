@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+
+# Tipos MIME de lo que publica el servidor de pruebas
+CONTENT_TYPES = {
+    '.json': 'application/json',
+    '.mpd': 'application/dash+xml',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+    '.ts': 'video/mp2t',
+    '.mp4': 'video/mp4',
+    '.jpg': 'image/jpeg',
+}
+
+# Duración de cada fragmento DASH/HLS; el GOP se fija a esto para poder cortar sin recodificar
+SEGMENT_SECONDS = 2
+FPS = 25
+
+
+def _run(ffmpeg: str, args: list, cwd: str):
+    subprocess.run([ffmpeg, '-hide_banner', '-loglevel', 'error', '-y'] + args,
+                   cwd=cwd, check=True)
+
+
+def build_media(directory: str, video_id: str, ffmpeg: str = 'ffmpeg', duration: int = 20,
+                height: int = 360) -> str:
+    # Genera un vídeo sintético (h264 + aac) y lo publica de tres formas: progresivo,
+    # DASH (manifiesto .mpd con fragmentos fMP4 separados) y HLS (.m3u8 con fragmentos .ts).
+    # Devuelve la carpeta que hay que servir bajo /media/<video_id>
+    root = os.path.join(directory, video_id)
+    for sub in ('dash', 'hls'):
+        os.makedirs(os.path.join(root, sub), exist_ok=True)
+    width = height * 16 // 9 // 2 * 2
+    _run(ffmpeg, [
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={FPS}:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+        '-g', str(FPS * SEGMENT_SECONDS), '-keyint_min', str(FPS * SEGMENT_SECONDS),
+        '-sc_threshold', '0', '-c:a', 'aac', '-ac', '2', '-b:a', '128k',
+        '-movflags', '+faststart', 'progressive.mp4',
+    ], root)
+    _run(ffmpeg, ['-i', 'progressive.mp4', '-frames:v', '1', '-q:v', '4', 'thumbnail.jpg'], root)
+    _run(ffmpeg, [
+        '-i', '../progressive.mp4', '-map', '0:v', '-map', '0:a', '-c', 'copy',
+        '-f', 'dash', '-seg_duration', str(SEGMENT_SECONDS), '-use_template', '1',
+        '-use_timeline', '1', '-adaptation_sets', 'id=0,streams=v id=1,streams=a',
+        '-init_seg_name', 'init-$RepresentationID$.m4s',
+        '-media_seg_name', 'chunk-$RepresentationID$-$Number%05d$.m4s', 'manifest.mpd',
+    ], os.path.join(root, 'dash'))
+    _run(ffmpeg, [
+        '-i', '../progressive.mp4', '-c', 'copy', '-f', 'hls',
+        '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', 'segment%03d.ts', '-master_pl_name', 'master.m3u8',
+        'stream.m3u8',
+    ], os.path.join(root, 'hls'))
+    meta = {
+        'id': video_id,
+        'title': f'Standin {video_id}',
+        'uploader': 'Standin',
+        'duration': duration,
+        'width': width,
+        'height': height,
+        'fps': FPS,
+        # Lo que anunciaría un sitio real para el archivo progresivo
+        'vcodec': 'avc1.64001f',
+        'acodec': 'mp4a.40.2',
+        'filesize': os.path.getsize(os.path.join(root, 'progressive.mp4')),
+    }
+    with open(os.path.join(root, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return root
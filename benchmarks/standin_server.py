@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 16 * 1024
+
+_RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+def synthetic_bytes(size: int, seed: str = 'standin') -> bytes:
+    # Contenido determinista para poder verificar lo descargado
+    block = hashlib.sha256(seed.encode()).digest() * 2048
+    return (block * (size // len(block) + 1))[:size]
+
+
+# Servidor HTTP local que imita un CDN: Range opcional, latencia y límite por conexión
+class StandinServer:
+    def __init__(self, files: dict = None, latency: float = 0.0,
+                 per_connection_bps: int = 0, support_ranges: bool = True):
+        self.files = dict(files or {})
+        self.latency = latency
+        self.per_connection_bps = per_connection_bps
+        self.support_ranges = support_ranges
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def add_file(self, path: str, content: bytes, content_type: str = 'application/octet-stream'):
+        self.files['/' + path.lstrip('/')] = (content, content_type)
+
+    def add_directory(self, prefix: str, directory: str, content_types: dict = None):
+        # Publica un árbol de archivos (manifiestos y fragmentos generados en disco)
+        content_types = content_types or {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, directory).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    content = f.read()
+                content_type = content_types.get(os.path.splitext(name)[1],
+                                                 'application/octet-stream')
+                self.add_file(f"{prefix.rstrip('/')}/{relative}", content, content_type)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_HEAD(self):
+                self._respond(send_body=False)
+
+            def do_GET(self):
+                self._respond(send_body=True)
+
+            def _respond(self, send_body):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                entry = server.files.get(self.path.split('?')[0])
+                if entry is None:
+                    self.send_error(404)
+                    return
+                content, content_type = entry
+                start, end, status = 0, len(content) - 1, 200
+                match = _RANGE_RE.match(self.headers.get('Range', ''))
+                if match and server.support_ranges:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)) if match.group(2) else end, end)
+                    status = 206
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(end - start + 1))
+                if server.support_ranges:
+                    self.send_header('Accept-Ranges', 'bytes')
+                if status == 206:
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+                self.end_headers()
+                if send_body:
+                    self._send_throttled(content, start, end)
+
+            def _send_throttled(self, content, start, end):
+                sent_start = time.time()
+                sent = 0
+                pos = start
+                try:
+                    while pos <= end:
+                        chunk = content[pos:min(pos + CHUNK_SIZE, end + 1)]
+                        self.wfile.write(chunk)
+                        pos += len(chunk)
+                        sent += len(chunk)
+                        with server._lock:
+                            server.bytes_sent += len(chunk)
+                        if server.per_connection_bps:
+                            expected = sent / server.per_connection_bps
+                            delay = expected - (time.time() - sent_start)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
@@ -0,0 +1,43 @@
+from yt_dlp.extractor.common import InfoExtractor
+
+
+# Extractor de los benchmarks: yt-dlp lo carga como plugin cuando benchmarks/ está en sys.path.
+# Descarga metadatos y manifiestos del servidor local igual que lo haría un extractor real
+class StandinIE(InfoExtractor):
+    IE_NAME = 'standin'
+    _VALID_URL = (r'https?://127\.0\.0\.1:\d+/watch/'
+                  r'(?P<delivery>dash|hls|progressive|all)/(?P<id>[\w-]+)')
+
+    def _real_extract(self, url):
+        delivery, video_id = self._match_valid_url(url).group('delivery', 'id')
+        base = f"{url.split('/watch/')[0]}/media/{video_id}"
+        meta = self._download_json(f'{base}/meta.json', video_id)
+
+        formats = []
+        if delivery in ('dash', 'all'):
+            formats += self._extract_mpd_formats(f'{base}/dash/manifest.mpd', video_id,
+                                                 mpd_id='dash')
+        if delivery in ('hls', 'all'):
+            formats += self._extract_m3u8_formats(f'{base}/hls/master.m3u8', video_id, 'mp4',
+                                                  m3u8_id='hls')
+        if delivery in ('progressive', 'all'):
+            formats.append({
+                'format_id': 'progressive',
+                'url': f'{base}/progressive.mp4',
+                'ext': 'mp4',
+                'width': meta['width'],
+                'height': meta['height'],
+                'fps': meta['fps'],
+                'vcodec': meta['vcodec'],
+                'acodec': meta['acodec'],
+                'filesize': meta['filesize'],
+            })
+
+        return {
+            'id': video_id,
+            'title': meta['title'],
+            'uploader': meta['uploader'],
+            'duration': meta['duration'],
+            'thumbnail': f'{base}/thumbnail.jpg',
+            'formats': formats,
+        }
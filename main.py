@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 import os
 
@@ -6,4 +7,6 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 from gui import main
 
 if __name__ == "__main__":
+    # Necesario en el .exe para los procesos de conversión de audio
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from config import DATA_DIR
+
+ARCHIVE_FILE = os.path.join(DATA_DIR, 'archive.jsonl')
+
+# Formatos sin pérdida: la calidad elegida no cambia el resultado
+LOSSLESS_FORMATS = ('flac', 'wav')
+
+_lock = threading.Lock()
+_index = None
+# Bytes ya leídos: si el archivo crece, otro proceso (worker de descargas) ha añadido entradas
+# y solo se lee lo nuevo; si encoge, se ha reescrito y se vuelve a leer entero
+_index_size = 0
+
+
+def archive_key(video_id: str, output_format: str, quality: str) -> str:
+    output_format = output_format.lower()
+    if output_format in LOSSLESS_FORMATS:
+        quality = ''
+    return f"{video_id}|{output_format}|{quality}"
+
+
+def _file_size():
+    try:
+        return os.path.getsize(ARCHIVE_FILE)
+    except OSError:
+        return 0
+
+
+def _load_index() -> dict:
+    global _index, _index_size
+    size = _file_size()
+    if _index is None or size < _index_size:
+        _index = {}
+        _index_size = 0
+    if size > _index_size:
+        try:
+            with open(ARCHIVE_FILE, 'rb') as f:
+                f.seek(_index_size)
+                tail = f.read(size - _index_size)
+        except OSError:
+            return _index
+        # Una línea sin salto final puede estar a medio escribir: se lee la próxima vez
+        end = tail.rfind(b"\n") + 1
+        for line in tail[:end].splitlines():
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+            _index[entry['key']] = entry
+        _index_size += end
+    return _index
+
+
+def lookup(key: str):
+    with _lock:
+        entry = _load_index().get(key)
+    if entry is None:
+        return None
+    # Solo cuenta si el archivo sigue en disco
+    if not entry.get('file_path') or not os.path.exists(entry['file_path']):
+        return None
+    return entry
+
+
+def add(key: str, title: str, file_path: str, size_mb: float, aliases=()):
+    # aliases: otras claves del mismo archivo (p. ej. la de la URL antes de extraer)
+    entries = [{
+        'key': k,
+        'title': title,
+        'file_path': file_path,
+        'size_mb': size_mb,
+        'date': datetime.now().strftime('%d/%m/%Y %H:%M'),
+    } for k in dict.fromkeys([key, *aliases])]
+    with _lock:
+        index = _load_index()
+        # Las líneas propias se vuelven a leer con la cola del archivo, junto con lo que otro
+        # proceso haya añadido a la vez
+        with open(ARCHIVE_FILE, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                index[entry['key']] = entry
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,258 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import load_config
+
+# Ráfaga que admite el cubo (segundos de su ritmo)
+BURST_SECONDS = 0.5
+# Espera máxima de una vez: así se atienden enseguida la cancelación y los cambios de ritmo
+MAX_SLEEP = 0.25
+# Cada cuánto se reparte de nuevo el límite global entre los trabajos
+REBALANCE_INTERVAL = 0.5
+# Mínimo por trabajo, para que uno parado pueda arrancar y demostrar que quiere más
+MIN_RATE = 16 * 1024
+# Uso a partir del cual un trabajo se considera limitado (quiere más de lo que tiene)
+SATURATION = 0.9
+# Margen sobre lo que usa un trabajo que no llega a su parte
+HEADROOM = 1.25
+# Una velocidad informada más antigua que esto no cuenta (el trabajo está en postproceso)
+STALE_REPORT = 2.0
+
+
+class TokenBucket:
+    # Cubo de fichas con deuda: consume() descuenta siempre y espera lo que falte
+    def __init__(self, rate: float = None):
+        self.rate = rate
+        self.tokens = self._burst()
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _burst(self):
+        return self.rate * BURST_SECONDS if self.rate else 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self._burst(), self.tokens + (now - self._last) * self.rate)
+        else:
+            self.tokens = 0
+        self._last = now
+
+    def set_rate(self, rate: float = None):
+        with self._lock:
+            self._refill()
+            self.rate = rate or None
+
+    def consume(self, count: int, should_stop=None) -> bool:
+        with self._lock:
+            self._refill()
+            if self.rate:
+                self.tokens -= count
+        while True:
+            with self._lock:
+                self._refill()
+                deficit, rate = -self.tokens, self.rate
+            if not rate or deficit <= 0:
+                return True
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(MAX_SLEEP, deficit / rate))
+
+
+class Allocation:
+    # Parte del ancho de banda de un trabajo. En local se mide por lo consumido; si el trabajo
+    # corre en otro proceso, por la velocidad que informa (report)
+    def __init__(self, weight: float = 1.0, rate: float = None):
+        self.weight = max(0.01, weight)
+        self.bucket = TokenBucket(rate)
+        self._bytes = 0
+        self._reported = None
+        self._reported_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def set_rate(self, rate: float = None):
+        self.bucket.set_rate(rate)
+
+    def consume(self, count: int, should_stop=None) -> bool:
+        with self._lock:
+            self._bytes += count
+        return self.bucket.consume(count, should_stop)
+
+    def report(self, speed: float):
+        with self._lock:
+            self._reported = speed or 0
+            self._reported_at = time.monotonic()
+
+    def take_usage(self, elapsed: float):
+        # Bytes/s desde la muestra anterior; None si aún no hay datos
+        with self._lock:
+            if self._reported is not None:
+                if time.monotonic() - self._reported_at > STALE_REPORT:
+                    return 0.0
+                return self._reported
+            if elapsed <= 0:
+                return None
+            consumed, self._bytes = self._bytes, 0
+        return consumed / elapsed
+
+
+def water_fill(cap: float, demands: dict, weights: dict) -> dict:
+    # Reparto max-min ponderado: quien pide menos que su parte se queda con lo que pide
+    # y el resto se divide entre los demás según su peso (None = sin tope de demanda)
+    rates = {}
+    active = set(demands)
+    remaining = cap
+    while active:
+        total_weight = sum(weights[key] for key in active)
+        satisfied = {key for key in active if demands[key] is not None
+                     and demands[key] <= remaining * weights[key] / total_weight}
+        if not satisfied:
+            for key in active:
+                rates[key] = remaining * weights[key] / total_weight
+            break
+        for key in satisfied:
+            rates[key] = demands[key]
+            remaining -= demands[key]
+        active -= satisfied
+    if not active and remaining > 0 and rates:
+        # Todos satisfechos: el sobrante también se reparte, para que quien acelere no espere
+        total_weight = sum(weights[key] for key in rates)
+        for key in rates:
+            rates[key] += remaining * weights[key] / total_weight
+    return rates
+
+
+def _minutes(value: str) -> int:
+    hours, _, minutes = value.partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def current_limit(limit_kbps: float, profiles: list, now: datetime = None):
+    # Límite vigente en bytes/s (None = sin límite). Un perfil {'start': '09:00', 'end': '18:00',
+    # 'limit_kbps': 500} manda dentro de su franja; las franjas pueden cruzar la medianoche
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for profile in profiles or []:
+        try:
+            start, end = _minutes(profile['start']), _minutes(profile['end'])
+            limit = float(profile['limit_kbps'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+        if inside:
+            limit_kbps = limit
+            break
+    return limit_kbps * 1024 if limit_kbps and limit_kbps > 0 else None
+
+
+class BandwidthScheduler:
+    # Reparte un límite global entre los trabajos activos; lo que no usa uno lo aprovechan los
+    # demás, así que el total se mantiene en el límite mientras alguno quiera más
+    def __init__(self, limit_kbps: float = 0, profiles: list = None):
+        self.limit_kbps = limit_kbps
+        self.profiles = list(profiles or [])
+        self._allocations = set()
+        self._last = {}
+        self._demands = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def configure(self, limit_kbps: float, profiles: list = None):
+        with self._lock:
+            self.limit_kbps = limit_kbps
+            self.profiles = list(profiles or [])
+        self._distribute()
+
+    def register(self, weight: float = 1.0) -> Allocation:
+        allocation = Allocation(weight)
+        with self._lock:
+            self._allocations.add(allocation)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="bandwidth-scheduler",
+                                                daemon=True)
+                self._thread.start()
+        self._distribute()
+        return allocation
+
+    def unregister(self, allocation: Allocation):
+        with self._lock:
+            self._allocations.discard(allocation)
+            self._last.pop(allocation, None)
+            self._demands.pop(allocation, None)
+        self._distribute()
+
+    def rebalance(self):
+        # Mide lo que ha usado cada trabajo desde la vez anterior y reparte según eso
+        with self._lock:
+            now = time.monotonic()
+            for allocation in self._allocations:
+                elapsed = now - self._last.get(allocation, now)
+                self._last[allocation] = now
+                usage = allocation.take_usage(elapsed)
+                rate = allocation.rate
+                if usage is None or rate is None or usage >= rate * SATURATION:
+                    # Sin datos o usando todo lo que tiene: puede querer más
+                    self._demands[allocation] = None
+                else:
+                    self._demands[allocation] = max(MIN_RATE, usage * HEADROOM)
+        self._distribute()
+
+    def _distribute(self):
+        # Con las últimas demandas medidas: altas, bajas y cambios de límite no esperan a medir
+        with self._lock:
+            allocations = list(self._allocations)
+            cap = current_limit(self.limit_kbps, self.profiles)
+            demands = {a: self._demands.get(a) for a in allocations}
+            weights = {a: a.weight for a in allocations}
+        if cap is None:
+            for allocation in allocations:
+                allocation.set_rate(None)
+            return
+        for allocation, rate in water_fill(cap, demands, weights).items():
+            allocation.set_rate(max(MIN_RATE, rate))
+
+    def _loop(self):
+        while True:
+            time.sleep(REBALANCE_INTERVAL)
+            with self._lock:
+                if not self._allocations:
+                    self._thread = None
+                    return
+            self.rebalance()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> BandwidthScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = load_config()
+            _scheduler = BandwidthScheduler(config['bandwidth_limit_kbps'],
+                                            config['bandwidth_profiles'])
+        return _scheduler
+
+
+_local = threading.local()
+
+
+def current_allocation():
+    return getattr(_local, 'allocation', None)
+
+
+@contextmanager
+def use_allocation(allocation: Allocation):
+    previous = current_allocation()
+    _local.allocation = allocation
+    try:
+        yield allocation
+    finally:
+        _local.allocation = previous
@@ -0,0 +1,128 @@
+import glob
+import os
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+
+import yt_dlp.utils
+
+
+class DownloadCancelled(yt_dlp.utils.DownloadCancelled):
+    # Subclase de la de yt-dlp: la propaga sin envolverla en DownloadError
+    msg = 'Descarga cancelada por el usuario'
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._processes = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __call__(self) -> bool:
+        # Se puede pasar directamente como cancel_check
+        return self._event.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise DownloadCancelled()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+        for proc in processes:
+            _kill(proc)
+
+    def track(self, proc):
+        # Un proceso lanzado después de cancelar se mata en el momento
+        with self._lock:
+            if not self._event.is_set():
+                self._processes.add(proc)
+                return
+        _kill(proc)
+
+
+def _kill(proc):
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except OSError:
+        pass
+
+
+_local = threading.local()
+
+
+def current_token():
+    return getattr(_local, 'token', None)
+
+
+@contextmanager
+def use_token(token: CancelToken):
+    previous = current_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def track(proc):
+    token = current_token()
+    if token is not None:
+        token.track(proc)
+
+
+def _install_popen_hook():
+    # yt-dlp lanza ffmpeg/ffprobe con utils.Popen desde el hilo del trabajo:
+    # cada proceso queda asociado al token de ese hilo y se mata al cancelar
+    popen = yt_dlp.utils.Popen
+    if getattr(popen, '_cancel_hook', False):
+        return
+    original_init = popen.__init__
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        track(self)
+
+    popen.__init__ = __init__
+    popen._cancel_hook = True
+
+
+_install_popen_hook()
+
+# Margen para la resolución de mtime del sistema de archivos (FAT: 2 s)
+MTIME_SLACK = 2
+
+# yt-dlp nombra los streams a mezclar "título.f137.mp4"
+_FORMAT_SUFFIX_RE = re.compile(r'\.f[\w-]+$')
+
+
+def discard_partials(paths, since: float = None, temp_exts=()):
+    # Borra lo que deja a medias una descarga cancelada: .part, .ytdl, estado de tramos,
+    # fragmentos y streams sin mezclar. De los temporales de ffmpeg (título.temp.ext) solo los
+    # de las extensiones de este trabajo: otro trabajo del mismo vídeo puede estar usando los suyos.
+    # Con since, solo lo modificado desde entonces: nunca un archivo que ya estaba antes del trabajo
+    removed = []
+    temp_exts = set(temp_exts) | {os.path.splitext(p)[1][1:] for p in paths}
+    for path in set(paths):
+        base = os.path.splitext(path)[0]
+        merged_base = _FORMAT_SUFFIX_RE.sub('', base)
+        candidates = [path, path + '.part', path + '.ytdl', path + '.part.ranges']
+        candidates += glob.glob(glob.escape(path) + '.part-Frag*')
+        for stem in {base, merged_base}:
+            candidates += [f'{stem}.temp.{ext}' for ext in temp_exts if ext]
+        for candidate in candidates:
+            try:
+                if since is not None and os.path.getmtime(candidate) < since - MTIME_SLACK:
+                    continue
+                os.remove(candidate)
+                removed.append(candidate)
+            except OSError:
+                pass
+    return removed
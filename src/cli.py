@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(__file__))
+from downloader import (get_video_info, iter_playlist_entries, looks_like_playlist, is_archived,
+                        AUDIO_FORMATS, VIDEO_FORMATS, AUDIO_QUALITIES)
+from job_queue import DownloadQueue, Job, run_download_job, job_from_journal, DONE
+from config import load_config
+from bandwidth import get_scheduler
+import journal
+
+# Códigos de salida
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def _output_format(value: str) -> str:
+    formats = list(dict.fromkeys(f.strip().lower() for f in value.split(',') if f.strip()))
+    if len(formats) == 1 and formats[0] in VIDEO_FORMATS + AUDIO_FORMATS:
+        return formats[0]
+    if not formats or any(f not in AUDIO_FORMATS for f in formats):
+        raise argparse.ArgumentTypeError(
+            f"formato no válido: '{value}' (varios formatos solo para audio: "
+            f"{', '.join(AUDIO_FORMATS)})")
+    return ','.join(formats)
+
+
+def _weight(value: str) -> float:
+    try:
+        weight = float(value)
+    except ValueError:
+        weight = 0
+    if weight <= 0:
+        raise argparse.ArgumentTypeError(f"peso no válido: '{value}' (debe ser mayor que 0)")
+    return weight
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Descarga vídeos y audio de YouTube sin interfaz gráfica.")
+    parser.add_argument("url", nargs="?", help="URL de un vídeo (modo individual)")
+    parser.add_argument("-b", "--batch", metavar="FICHERO",
+                        help="fichero con una URL por línea ('-' para leer de stdin)")
+    parser.add_argument("-f", "--format", type=_output_format,
+                        help="formato de salida (por defecto, el de la configuración); "
+                             "varios formatos de audio separados por comas (mp3,flac,m4a) "
+                             "descargan una vez y convierten en paralelo")
+    parser.add_argument("-q", "--quality",
+                        help="calidad: 1080p, 720p... para vídeo o 320kbps, 192kbps... para audio")
+    parser.add_argument("-o", "--output", help="carpeta de destino")
+    parser.add_argument("-j", "--jobs", type=int, help="descargas simultáneas")
+    parser.add_argument("--per-host", type=int, help="descargas simultáneas por servidor")
+    parser.add_argument("--limit-rate", type=int, metavar="KBPS",
+                        help="límite de descarga en KB/s para todas las descargas juntas "
+                             "(0 = sin límite; por defecto, el de la configuración)")
+    parser.add_argument("--weight", type=_weight, default=1.0,
+                        help="peso en el reparto de --limit-rate entre las descargas (2 recibe "
+                             "el doble que 1; por defecto 1). En el lote, cada línea puede llevar "
+                             "el suyo: 'URL 2'")
+    parser.add_argument("--info", action="store_true",
+                        help="solo muestra la información de cada vídeo, sin descargar")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="ignora la caché de metadatos")
+    parser.add_argument("--playlist-start", type=int, default=0, metavar="N",
+                        help="en playlists y canales, empieza por la entrada N (desde 0)")
+    parser.add_argument("--resume", action="store_true",
+                        help="reanuda primero las descargas que quedaron sin terminar")
+    parser.add_argument("--save-history", action="store_true",
+                        help="registra las descargas completadas en el historial")
+    return parser
+
+
+def _iter_urls(args):
+    # (url, peso); en el lote cada línea puede llevar su peso detrás de la URL
+    if args.url:
+        yield args.url.strip(), args.weight
+    if args.batch:
+        stream = sys.stdin if args.batch == '-' else open(args.batch, 'r', encoding='utf-8')
+        try:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    url, _, weight = line.partition(' ')
+                    try:
+                        yield url, _weight(weight.strip()) if weight.strip() else args.weight
+                    except argparse.ArgumentTypeError:
+                        yield url, args.weight
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def _iter_jobs(urls, args, out, quality, output_format, output_path):
+    # Las playlists y canales se expanden según se paginan, sin esperar al listado completo
+    for url, weight in urls:
+        if not looks_like_playlist(url):
+            yield Job(url, quality, output_format, output_path, weight=weight)
+            continue
+        try:
+            for entry in iter_playlist_entries(url, args.playlist_start):
+                yield Job(entry['url'], quality, output_format, output_path,
+                          title=entry['title'], playlist_index=entry['index'], weight=weight)
+        except Exception as e:
+            out.write({'url': url, 'status': 'failed', 'error': str(e)})
+            yield None
+
+
+class _Output:
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.stream.flush()
+
+
+def _run_info(urls, args, out: _Output) -> int:
+    exit_code = EXIT_OK
+    for url, _ in urls:
+        try:
+            info = get_video_info(url, use_cache=not args.no_cache)
+            out.write({'url': url, 'status': 'ok', 'info': info})
+        except Exception as e:
+            out.write({'url': url, 'status': 'failed', 'error': str(e)})
+            exit_code = EXIT_FAILED
+    return exit_code
+
+
+def _run_downloads(urls, args, config: dict, out: _Output) -> int:
+    output_format = (args.format or config['default_format']).lower()
+    if args.quality:
+        quality = args.quality
+    elif output_format.split(',')[0] in AUDIO_FORMATS:
+        quality = config.get('default_quality_audio', AUDIO_QUALITIES[0])
+    else:
+        quality = config.get('default_quality_video', 'Mejor disponible')
+    output_path = args.output or config['default_output_path']
+    os.makedirs(output_path, exist_ok=True)
+    if args.limit_rate is not None:
+        get_scheduler().configure(args.limit_rate, config['bandwidth_profiles'])
+
+    def runner(job, progress_callback, file_callback):
+        # Lo ya archivado se resuelve sin extraer: download_video lo devuelve sin red
+        if not is_archived(job.url, job.output_format, job.quality):
+            info = get_video_info(job.url, use_cache=not args.no_cache)
+            job.title = info['title']
+        result = run_download_job(job, progress_callback, file_callback)
+        if result and job.title == job.url:
+            job.title = result['title']
+        return result
+
+    cond = threading.Condition()
+    state = {'submitted': 0, 'finished': 0, 'failed': 0}
+
+    def on_update(job):
+        if not job.finished:
+            return
+        record = {'url': job.url, 'status': job.state, 'title': job.title}
+        if job.playlist_index is not None:
+            record['playlist_index'] = job.playlist_index
+        if job.state == DONE:
+            record['result'] = job.result
+            if args.save_history and not job.result.get('already_present'):
+                from history import save_entry, build_entry
+                save_entry(build_entry(job.result))
+        elif job.error:
+            record['error'] = job.error
+        out.write(record)
+        with cond:
+            state['finished'] += 1
+            if job.state != DONE:
+                state['failed'] += 1
+            cond.notify_all()
+
+    workers = args.jobs or config['max_concurrent_downloads']
+    queue = DownloadQueue(workers=workers,
+                          per_host=args.per_host or config['max_downloads_per_host'],
+                          on_update=on_update, runner=runner, max_pending=workers * 2,
+                          use_journal=True)
+    try:
+        if args.resume:
+            entries = journal.load_unfinished()
+            journal.compact()
+            for entry in entries:
+                queue.submit(job_from_journal(entry))
+                with cond:
+                    state['submitted'] += 1
+        for job in _iter_jobs(urls, args, out, quality, output_format, output_path):
+            if job is None:
+                # Playlist ilegible: cuenta como fallo
+                with cond:
+                    state['failed'] += 1
+                continue
+            queue.submit(job)
+            with cond:
+                state['submitted'] += 1
+        with cond:
+            while state['finished'] < state['submitted']:
+                cond.wait()
+    except KeyboardInterrupt:
+        # Se espera a los workers: matan sus ffmpeg y borran los archivos a medias al salir
+        queue.shutdown(wait=True)
+        return EXIT_INTERRUPTED
+    queue.shutdown()
+    return EXIT_FAILED if state['failed'] else EXIT_OK
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.url and not args.batch and not args.resume:
+        parser.print_usage(sys.stderr)
+        print("Error: indica una URL, un fichero con --batch o --resume.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.playlist_start < 0:
+        print("Error: --playlist-start no puede ser negativo.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.limit_rate is not None and args.limit_rate < 0:
+        print("Error: --limit-rate no puede ser negativo.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs debe ser mayor que 0.", file=sys.stderr)
+        return EXIT_USAGE
+
+    config = load_config()
+    out = _Output(sys.stdout)
+    urls = _iter_urls(args)
+    try:
+        if args.info:
+            return _run_info(urls, args, out)
+        return _run_downloads(urls, args, config, out)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,23 @@ DEFAULTS = {
     'default_format': 'mp4',
     'default_quality_video': 'Mejor disponible',
     'default_quality_audio': '320kbps',
+    'info_cache_ttl_hours': 6,
+    'info_cache_max_entries': 500,
+    'max_concurrent_downloads': 3,
+    'max_downloads_per_host': 2,
+    'max_connections': 16,
+    # Conexiones por rangos para formatos de un solo archivo (1 = desactivado: descarga de yt-dlp)
+    'range_split_connections': 1,
+    # Procesos de ffmpeg al recodificar vídeo por tramos (0 = uno por núcleo)
+    'transcode_workers': 0,
+    # Vídeo + audio directos a ffmpeg por pipes, sin archivos intermedios (solo Linux/macOS)
+    'stream_merge': False,
+    # Límite global de descarga entre todos los trabajos (KB/s, 0 = sin límite)
+    'bandwidth_limit_kbps': 0,
+    # Franjas horarias con su propio límite: [{"start": "09:00", "end": "18:00", "limit_kbps": 500}]
+    'bandwidth_profiles': [],
+    # Espacio en disco para las miniaturas ya escaladas (MB); las menos usadas se borran antes
+    'thumbnail_cache_mb': 100,
 }
 
 
@@ -1,7 +1,26 @@
 import yt_dlp
+import copy
+import itertools
+import multiprocessing
 import os
+import queue
+import re
+import signal
 import time
 import sys
+from urllib.parse import urlsplit, parse_qs
+
+import archive
+from config import load_config
+from info_cache import get_info_cache, video_key
+from fragments import FragmentController
+from stream_merge import StreamingYoutubeDL
+from concurrent.futures import ProcessPoolExecutor
+from transcode import AudioConvertPP, VideoConvertPP, transcode_audio, target_extension
+from planner import plan_audio, plan_video
+from cancel import DownloadCancelled, discard_partials
+from bandwidth import current_allocation
+from thumb_select import pick_thumbnail, SEARCH_SIZE, HISTORY_SIZE
 
 # Formatos de audio soportados
 AUDIO_FORMATS = ["mp3", "aac", "flac", "ogg", "wav", "m4a"]
@@ -12,6 +31,22 @@ VIDEO_FORMATS = ["mp4", "mkv", "avi", "webm", "mov"]
 # Calidades de audio disponibles
 AUDIO_QUALITIES = ["320kbps", "192kbps", "128kbps"]
 
+# Margen antes de la caducidad de las URLs firmadas para no empezar una descarga que fallará
+FORMAT_URL_EXPIRY_MARGIN = 10 * 60
+# Antigüedad máxima de una extracción cuyas URLs no indican caducidad
+MAX_INFO_AGE = 60 * 60
+
+_EXPIRE_PATH_RE = re.compile(r'/expire/(\d+)')
+
+# Rutas de YouTube que siempre son listas (playlist, canal o una de sus pestañas)
+_PLAYLIST_URL_RE = re.compile(
+    r'youtube\.com/(?:playlist\?|@[^/?#]+|channel/|c/|user/)')
+_LIST_PARAM_RE = re.compile(r'[?&]list=')
+_VIDEO_PARAM_RE = re.compile(r'[?&]v=|youtu\.be/')
+
+# Extractores cuyas entradas planas son a su vez listas (pestañas de un canal)
+_NESTED_PLAYLIST_IES = ('YoutubeTab', 'YoutubePlaylist')
+
 def get_ffmpeg_path():
     if getattr(sys, 'frozen', False):
         base_path = sys._MEIPASS
@@ -24,16 +59,164 @@ def get_ffmpeg_path():
     return None
 
 
-def get_video_info(url: str) -> dict:
+def _url_expiry(url: str):
+    expire = parse_qs(urlsplit(url).query).get('expire')
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+    match = _EXPIRE_PATH_RE.search(url)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def formats_expired(info: dict) -> bool:
+    now = time.time()
+    expiries = [_url_expiry(f['url']) for f in info.get('formats', []) if f.get('url')]
+    expiries = [e for e in expiries if e is not None]
+    if expiries:
+        return min(expiries) - FORMAT_URL_EXPIRY_MARGIN < now
+    return now - info.get('epoch', 0) > MAX_INFO_AGE
+
+
+def looks_like_playlist(url: str) -> bool:
+    if _PLAYLIST_URL_RE.search(url):
+        return True
+    return bool(_LIST_PARAM_RE.search(url)) and not _VIDEO_PARAM_RE.search(url)
+
+
+def _resolve_url_result(ydl, result: dict) -> dict:
+    # Sigue las redirecciones (p. ej. canal -> pestaña de vídeos) sin procesar las entradas
+    while result.get('_type') in ('url', 'url_transparent'):
+        result = ydl.extract_info(result['url'], download=False, process=False,
+                                  ie_key=result.get('ie_key'))
+    return result
+
+
+def _playlist_summary(result: dict) -> dict:
+    return {
+        'id': result.get('id'),
+        'extractor': result.get('extractor_key'),
+        'title': result.get('title', 'Sin título'),
+        'duration': 0,
+        'thumbnail': pick_thumbnail(result.get('thumbnails'), *SEARCH_SIZE),
+        'uploader': result.get('uploader') or result.get('channel', 'Desconocido'),
+        'formats': [],
+        'is_playlist': True,
+        'playlist_count': result.get('playlist_count'),
+    }
+
+
+def iter_playlist_entries(url: str, start: int = 0):
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = _resolve_url_result(ydl, ydl.extract_info(url, download=False, process=False))
+        if result.get('_type') not in ('playlist', 'multi_video'):
+            raise ValueError("La URL no corresponde a una playlist ni a un canal.")
+        # 'skip' es lo que queda del desplazamiento; cada pestaña anidada descuenta lo que salta
+        state = {'skip': start, 'index': start}
+        yield from _walk_playlist(ydl, result.get('entries') or [], state)
+
+
+def _walk_playlist(ydl, entries, state):
+    entries, first = _peek_entry(entries)
+    # En la raíz de un canal el desplazamiento se aplica a los vídeos, no a la lista de pestañas
+    nested_root = bool(first) and first.get('ie_key') in _NESTED_PLAYLIST_IES
+    for entry in _iter_entries(entries, {'skip': 0} if nested_root else state):
+        if entry and entry.get('ie_key') in _NESTED_PLAYLIST_IES:
+            nested = _resolve_url_result(
+                ydl, ydl.extract_info(entry['url'], download=False, process=False))
+            yield from _walk_playlist(ydl, nested.get('entries') or [], state)
+            continue
+        if state['skip']:
+            state['skip'] -= 1
+            continue
+        if entry:
+            yield {
+                'index': state['index'],
+                'id': entry.get('id'),
+                'url': entry.get('url') or entry.get('webpage_url'),
+                'title': entry.get('title') or entry.get('id') or entry.get('url'),
+            }
+        state['index'] += 1
+
+
+def _peek_entry(entries):
+    if isinstance(entries, yt_dlp.utils.PagedList):
+        results = entries.getpage(0)
+        return entries, (results[0] if results else None)
+    it = iter(entries)
+    for first in it:
+        return itertools.chain([first], it), first
+    return [], None
+
+
+def _iter_entries(entries, state):
+    # Las entradas llegan según se paginan; nunca se construye la lista completa.
+    # Se saltan las primeras state['skip'] y se descuentan las saltadas (menos si la lista es más corta)
+    start = state['skip']
+    if isinstance(entries, yt_dlp.utils.PagedList):
+        page_size = entries._pagesize
+        page, offset = divmod(start, page_size)
+        results = entries.getpage(page) if page < entries._pagecount else []
+        if not results and page:
+            # Más corta que el desplazamiento: hay que contar lo que tenía para la siguiente
+            state['skip'] -= _paged_count(entries)
+            return
+        state['skip'] -= min(start, page * page_size + len(results))
+        while results:
+            yield from results[offset:]
+            page += 1
+            if len(results) < page_size or page >= entries._pagecount:
+                return
+            offset = 0
+            results = entries.getpage(page)
+    else:
+        it = iter(entries)
+        for _ in itertools.islice(it, start):
+            state['skip'] -= 1
+        yield from it
+
+
+def _paged_count(entries):
+    page_size = entries._pagesize
+    count = page = 0
+    while page < entries._pagecount:
+        results = entries.getpage(page)
+        count += len(results)
+        if len(results) < page_size:
+            break
+        page += 1
+    return count
+
+
+def get_video_info(url: str, use_cache: bool = True) -> dict:
+    cache = get_info_cache()
+    key = video_key(url)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
     ydl_opts = {
         'quiet': True,
         'no_warnings': True,
         'noplaylist': True,
+        'lazy_playlist': True,
     }
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=False)
-        if info.get('_type') == 'playlist':
-            raise ValueError("Las URLs de playlist no están soportadas. Pega la URL de un vídeo individual.")
+        result = _resolve_url_result(ydl, ydl.extract_info(url, download=False, process=False))
+        if result.get('_type') in ('playlist', 'multi_video'):
+            # Las entradas se enumeran después, de forma perezosa (iter_playlist_entries)
+            summary = _playlist_summary(result)
+            cache.put(key, summary)
+            return summary
+        info = ydl.sanitize_info(ydl.process_ie_result(result, download=False))
+        cache.put_raw(key, info)
         formats = []
         seen = set()
         for f in info.get('formats', []):
@@ -44,41 +227,219 @@ def get_video_info(url: str) -> dict:
                     seen.add(label)
                     formats.append(label)
         formats.sort(key=lambda x: int(x[:-1]), reverse=True)
-        return {
+        summary = {
+            'id': info.get('id'),
+            'extractor': info.get('extractor_key'),
             'title': info.get('title', 'Sin título'),
             'duration': info.get('duration', 0),
-            'thumbnail': info.get('thumbnail', ''),
+            # La variante justa para mostrarla, no la mayor
+            'thumbnail': pick_thumbnail(info.get('thumbnails'), *SEARCH_SIZE,
+                                        info.get('thumbnail', '')),
             'uploader': info.get('uploader') or info.get('channel', 'Desconocido'),
             'formats': formats,
         }
+    cache.put(key, summary)
+    return summary
+
+
+def canonical_video_id(url: str, info: dict = None):
+    # "extractor:id"; para URLs que no son de YouTube se usa la búsqueda cacheada si la hay
+    if info and info.get('extractor_key') and info.get('id'):
+        return f"{info['extractor_key'].lower()}:{info['id']}"
+    key = video_key(url)
+    if key.startswith('url:'):
+        cached = get_info_cache().get(key)
+        if cached and cached.get('extractor') and cached.get('id'):
+            return f"{cached['extractor'].lower()}:{cached['id']}"
+    return key
+
+
+def _url_aliases(url: str, video_id: str, output_format: str, quality: str) -> list:
+    # Sin información cacheada, una URL que no es de YouTube se busca por "url:..."; se archiva
+    # también con esa clave para que la siguiente vez se encuentre sin extraer
+    key = video_key(url)
+    return [archive.archive_key(key, output_format, quality)] if key != video_id else []
+
+
+def is_archived(url: str, output_format: str, quality: str) -> bool:
+    # Todos los formatos pedidos ya están en disco: download_video no necesitará la red
+    video_id = canonical_video_id(url)
+    return all(archive.lookup(archive.archive_key(video_id, fmt.strip(), quality))
+               for fmt in output_format.split(',') if fmt.strip())
+
+
+def _already_present(entry: dict, video_id: str, output_format: str, quality: str,
+                     output_path: str) -> dict:
+    return {
+        'title': entry['title'],
+        'format': output_format,
+        'quality': quality,
+        'size_mb': entry.get('size_mb'),
+        'elapsed_seconds': 0,
+        'output_path': output_path,
+        'file_path': entry['file_path'],
+        'thumbnail_url': None,
+        'video_id': video_id,
+        'already_present': True,
+    }
+
+
+def _final_filepath(info: dict):
+    downloads = info.get('requested_downloads') or []
+    if downloads:
+        return downloads[-1].get('filepath')
+    return info.get('filepath')
+
+
+def audio_codec(output_format: str, quality: str):
+    bitrate = quality.replace('kbps', '')
+    codec_map = {
+        'mp3':  ('mp3',    bitrate),
+        'aac':  ('aac',    bitrate),
+        'flac': ('flac',   '0'),
+        'ogg':  ('vorbis', bitrate),
+        'wav':  ('wav',    '0'),
+        'm4a':  ('m4a',    bitrate),
+    }
+    return codec_map[output_format]
+
+
+def _usable_info(url: str, info: dict):
+    # Extracción cruda de la búsqueda (caché en memoria) si sus URLs siguen vigentes
+    if info is None:
+        info = get_info_cache().get_raw(video_key(url))
+    if info is not None and formats_expired(info):
+        return None
+    return info
+
+
+def _run_download(url: str, ydl_opts: dict, info: dict, progress_callback=None,
+                  cancel_check=None, file_callback=None, postprocessors=()):
+    final_files = []
+    seen_files = set()
+    # Todo lo que escribe este trabajo, para recuperarlo si se cancela
+    touched = set()
+    started = time.time()
+    # Si el presupuesto de conexiones está agotado, bind espera (cancelable) a que se libere
+    fragments = FragmentController(urlsplit(url).hostname, cancel_check=cancel_check)
+    # Parte del límite global de este trabajo; los bytes se descuentan según llegan
+    allocation = current_allocation()
+    received = {}
+
+    def check_cancel():
+        if cancel_check and cancel_check():
+            raise DownloadCancelled()
+
+    def progress_hook(d):
+        touched.update(p for p in (d.get('filename'), d.get('tmpfilename')) if p)
+        check_cancel()
+        # Los descargadores propios (throttled) ya descuentan en sus hilos de lectura
+        if allocation and d['status'] == 'downloading' and not d.get('throttled'):
+            downloaded = d.get('downloaded_bytes') or 0
+            # La primera muestra es la base: lo reanudado de un .part no se vuelve a contar
+            delta = downloaded - received.get(d.get('filename'), downloaded)
+            received[d.get('filename')] = downloaded
+            if delta > 0:
+                allocation.consume(delta, cancel_check)
+                check_cancel()
+        fragments.on_progress(d)
+        if file_callback and d.get('filename') and d['filename'] not in seen_files:
+            seen_files.add(d['filename'])
+            file_callback(d['filename'])
+        if d['status'] == 'downloading' and progress_callback:
+            total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
+            downloaded = d.get('downloaded_bytes', 0)
+            speed = d.get('speed', 0) or 0
+            if total > 0:
+                percentage = (downloaded / total) * 100
+                progress_callback(percentage, speed)
+        elif d['status'] == 'finished':
+            if progress_callback:
+                progress_callback(100, 0)
+
+    def postprocessor_hook(d):
+        # Entrada de cada postproceso (p. ej. la mezcla antes de VideoConvertPP)
+        if d['info_dict'].get('filepath'):
+            touched.add(d['info_dict']['filepath'])
+        if d['status'] == 'started':
+            check_cancel()
+
+    ydl_opts['progress_hooks'] = [progress_hook]
+    ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+    # El progreso llega por los hooks; la barra de yt-dlp ensuciaría la salida JSON de la CLI
+    ydl_opts['noprogress'] = True
+    # yt-dlp llama a post_hooks con la ruta final, tras la mezcla, el postproceso y el movimiento
+    ydl_opts['post_hooks'] = [final_files.append]
+    # Reanuda .part y fragmentos (.ytdl) de un intento anterior
+    ydl_opts['continuedl'] = True
+    # Formatos de un solo archivo: varias conexiones por rangos (1 = desactivado)
+    config = load_config()
+    ydl_opts['range_split_connections'] = config['range_split_connections']
+    # Mezcla en streaming de bestvideo+bestaudio (si no es posible, flujo normal)
+    ydl_opts['stream_merge'] = config['stream_merge']
+
+    info = _usable_info(url, info)
+
+    try:
+        check_cancel()
+        with StreamingYoutubeDL(ydl_opts) as ydl:
+            fragments.bind(ydl.params)
+            for pp in postprocessors:
+                ydl.add_post_processor(pp, when='post_process')
+            if info is not None:
+                # Reutiliza la extracción de la búsqueda: solo selección de formato y descarga
+                info = copy.deepcopy(info)
+            else:
+                info = ydl.extract_info(url, download=False, process=False)
+            # La extracción no se puede interrumpir: se comprueba en cuanto termina
+            check_cancel()
+            info = ydl.process_ie_result(info, download=True)
+        file_path = final_files[-1] if final_files else _final_filepath(info)
+        if not file_path or not os.path.exists(file_path):
+            file_path = None
+        return info, file_path, fragments.report()
+    except Exception as e:
+        # Un ffmpeg matado al cancelar llega como error de postproceso: se trata como cancelación
+        if cancel_check and cancel_check():
+            discard_partials(touched, since=started,
+                             temp_exts=[pp.target_ext for pp in postprocessors])
+            if isinstance(e, DownloadCancelled):
+                raise
+            raise DownloadCancelled() from e
+        raise
+    finally:
+        fragments.release()
+
+
+def _size_mb(path: str):
+    return round(os.path.getsize(path) / (1024 * 1024), 2)
 
 
 def download_video(url: str, quality: str, output_format: str, output_path: str,
-                   progress_callback=None, cancel_check=None) -> dict:
+                   progress_callback=None, cancel_check=None, info: dict = None,
+                   file_callback=None, plan_callback=None, postprocess_callback=None) -> dict:
     start_time = time.time()
     output_format = output_format.lower()
 
+    # Comprobación del archivo de descargas antes de cualquier acceso a la red
+    video_id = canonical_video_id(url, info)
+    archived = archive.lookup(archive.archive_key(video_id, output_format, quality))
+    if archived:
+        return _already_present(archived, video_id, output_format, quality, output_path)
+
     ffmpeg_location = get_ffmpeg_path()
+    info = _usable_info(url, info)
 
+    postprocessors = []
     if output_format in AUDIO_FORMATS:
-        codec_map = {
-            'mp3':  ('mp3',    quality.replace('kbps', '')),
-            'aac':  ('aac',    quality.replace('kbps', '')),
-            'flac': ('flac',   '0'),
-            'ogg':  ('vorbis', quality.replace('kbps', '')),
-            'wav':  ('wav',    '0'),
-            'm4a':  ('m4a',    quality.replace('kbps', '')),
-        }
-        codec, q = codec_map[output_format]
+        codec, q = audio_codec(output_format, quality)
+        # Prefiere una pista que se pueda copiar sin recodificar al formato pedido
+        plan = plan_audio(codec, info)
+        postprocessors.append(AudioConvertPP(codec, q))
         ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': plan['format'],
             'noplaylist': True,
             'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': codec,
-                'preferredquality': q,
-            }],
             'quiet': True,
             'no_warnings': True,
         }
@@ -86,74 +447,39 @@ def download_video(url: str, quality: str, output_format: str, output_path: str,
             ydl_opts['ffmpeg_location'] = ffmpeg_location
     else:
         height = quality.replace('p', '')
-        format_map = {
-            'mp4':  (f'bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/bestvideo[height<={height}]+bestaudio/best', 'mp4'),
-            'mkv':  (f'bestvideo[height<={height}]+bestaudio/best', 'mkv'),
-            'avi':  (f'bestvideo[height<={height}]+bestaudio/best', 'avi'),
-            'webm': (f'bestvideo[height<={height}][ext=webm]+bestaudio[ext=webm]/bestvideo[height<={height}]+bestaudio/best', 'webm'),
-            'mov':  (f'bestvideo[height<={height}]+bestaudio/best', 'mov'),
-        }
-        fmt_selector, merge_fmt = format_map.get(output_format, (f'bestvideo[height<={height}]+bestaudio/best', output_format))
+        # "Mejor disponible" (o una calidad desconocida) no limita la altura
+        max_height = int(height) if height.isdigit() else None
+        # Parejas que se remuxan sin recodificar primero; después, la mejor calidad
+        plan = plan_video(output_format, max_height, info)
+        postprocessors.append(VideoConvertPP(output_format, postprocess_callback, cancel_check))
         ydl_opts = {
-            'format': fmt_selector,
+            'format': plan['format'],
             'noplaylist': True,
             'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-            'merge_output_format': merge_fmt,
+            # Si los codecs no caben en el contenedor se mezcla en mkv y VideoConvertPP lo pasa
+            'merge_output_format': output_format if output_format == 'mkv' else f'{output_format}/mkv',
             'quiet': True,
             'no_warnings': True,
         }
         if ffmpeg_location:
             ydl_opts['ffmpeg_location'] = ffmpeg_location
 
-    downloaded_file = []
-    thumbnail_url = [None]
-
-    def progress_hook(d):
-        if cancel_check and cancel_check():
-            raise Exception("Descarga cancelada por el usuario")
-        if d['status'] == 'downloading' and progress_callback:
-            total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-            downloaded = d.get('downloaded_bytes', 0)
-            speed = d.get('speed', 0) or 0
-            if total > 0:
-                percentage = (downloaded / total) * 100
-                progress_callback(percentage, speed)
-        elif d['status'] == 'finished':
-            downloaded_file.append(d.get('filename', ''))
-            if progress_callback:
-                progress_callback(100, 0)
-
-    ydl_opts['progress_hooks'] = [progress_hook]
+    if plan_callback:
+        plan_callback(plan)
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            title = info.get('title', 'Sin título')
-            thumbnail_url[0] = info.get('thumbnail', '')
+        info, file_path, fragment_report = _run_download(
+            url, ydl_opts, info, progress_callback, cancel_check, file_callback, postprocessors)
+        title = info.get('title', 'Sin título')
 
         elapsed_time = round(time.time() - start_time, 1)
-        file_path = None
         file_size = None
-
-        if output_format in AUDIO_FORMATS:
-            if downloaded_file:
-                candidate = os.path.splitext(downloaded_file[0])[0] + f".{output_format}"
-                if os.path.exists(candidate):
-                    file_path = candidate
-                    file_size = round(os.path.getsize(candidate) / (1024 * 1024), 2)
-        else:
-            try:
-                files = [
-                    os.path.join(output_path, f)
-                    for f in os.listdir(output_path)
-                    if f.endswith(f'.{output_format}')
-                ]
-                if files:
-                    latest = max(files, key=os.path.getmtime)
-                    file_path = latest
-                    file_size = round(os.path.getsize(latest) / (1024 * 1024), 2)
-            except Exception:
-                pass
+        if file_path:
+            file_size = _size_mb(file_path)
+            video_id = canonical_video_id(url, info)
+            archive.add(archive.archive_key(video_id, output_format, quality),
+                        title, file_path, file_size,
+                        aliases=_url_aliases(url, video_id, output_format, quality))
 
         return {
             'title': title,
@@ -163,15 +489,182 @@ def download_video(url: str, quality: str, output_format: str, output_path: str,
             'elapsed_seconds': elapsed_time,
             'output_path': output_path,
             'file_path': file_path,
-            'thumbnail_url': thumbnail_url[0],
+            'thumbnail_url': pick_thumbnail(info.get('thumbnails'), *HISTORY_SIZE,
+                                            info.get('thumbnail', '')),
+            'video_id': video_id,
+            'fragments': fragment_report,
+            'transcoded': postprocessors[0].transcoded,
+            'plan': plan,
+            'segments': getattr(postprocessors[0], 'segments', None),
         }
 
+    except DownloadCancelled:
+        raise
     except Exception as e:
         error_msg = str(e)
         if "Sign in" in error_msg or "bot" in error_msg:
-            print("Error: Este vídeo requiere estar logueado en YouTube.")
-        elif "cancelada" in error_msg:
-            raise
+            print("Error: Este vídeo requiere estar logueado en YouTube.", file=sys.stderr)
         else:
-            print(f"Error al descargar: {e}")
-        return None
\ No newline at end of file
+            print(f"Error al descargar: {e}", file=sys.stderr)
+        return None
+
+
+def _kill_pid(pid: int):
+    try:
+        os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+    except OSError:
+        pass
+
+
+def _transcode_targets(source: str, base: str, targets: dict, duration, source_codec,
+                       progress_callback, cancel_check, target_callback) -> dict:
+    # Un proceso por objetivo hasta el número de núcleos; el progreso llega por una cola compartida
+    ffmpeg_location = get_ffmpeg_path()
+    progress = dict.fromkeys(targets, 0.0)
+    results = {}
+    with multiprocessing.Manager() as manager:
+        progress_queue = manager.Queue()
+        cancel_event = manager.Event()
+        workers = min(len(targets), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {}
+            for fmt, (codec, q) in targets.items():
+                target = f'{base}.{target_extension(codec)}'
+                futures[fmt] = pool.submit(transcode_audio, source, target, codec, q,
+                                           ffmpeg_location, duration, progress_queue, fmt,
+                                           source_codec, cancel_event)
+            pids = {}
+            while not all(f.done() for f in futures.values()):
+                if cancel_check and cancel_check():
+                    cancel_event.set()
+                    for f in futures.values():
+                        f.cancel()
+                    # Los ffmpeg en marcha mueren ya; cada worker borra su temporal y termina
+                    while True:
+                        try:
+                            kind, fmt, value = progress_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if kind == 'pid':
+                            pids[fmt] = value
+                        elif value >= 100:
+                            pids.pop(fmt, None)
+                    for pid in pids.values():
+                        _kill_pid(pid)
+                    raise DownloadCancelled()
+                try:
+                    kind, fmt, value = progress_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if kind == 'pid':
+                    pids[fmt] = value
+                    continue
+                progress[fmt] = percentage = value
+                if percentage >= 100:
+                    # Terminado: su pid puede reutilizarse y ya no se debe matar
+                    pids.pop(fmt, None)
+                if target_callback:
+                    target_callback(fmt, percentage)
+                if progress_callback:
+                    # La descarga ocupa la primera mitad de la barra y las conversiones la segunda
+                    progress_callback(50 + sum(progress.values()) / len(progress) / 2, 0)
+            for fmt, future in futures.items():
+                try:
+                    results[fmt] = future.result()
+                except Exception as e:
+                    results[fmt] = {'error': str(e)}
+    return results
+
+
+def download_audio_multi(url: str, formats: list, quality: str, output_path: str,
+                         progress_callback=None, cancel_check=None, info: dict = None,
+                         target_callback=None) -> dict:
+    # Descarga bestaudio una sola vez y lo convierte a cada formato en paralelo
+    start_time = time.time()
+    formats = list(dict.fromkeys(fmt.strip().lower() for fmt in formats if fmt.strip()))
+    for fmt in formats:
+        if fmt not in AUDIO_FORMATS:
+            raise ValueError(f"Formato de audio no soportado: {fmt}")
+
+    video_id = canonical_video_id(url, info)
+    targets = {}
+    for fmt in formats:
+        archived = archive.lookup(archive.archive_key(video_id, fmt, quality))
+        if archived:
+            targets[fmt] = _already_present(archived, video_id, fmt, quality, output_path)
+    pending = {fmt: audio_codec(fmt, quality) for fmt in formats if fmt not in targets}
+
+    title = next(iter(targets.values()))['title'] if targets else None
+    thumbnail = None
+    fragment_report = None
+    if pending:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'noplaylist': True,
+            # Nombre propio para el original: no choca con un objetivo de la misma extensión
+            'outtmpl': os.path.join(output_path, '%(title)s.source.%(ext)s'),
+            'quiet': True,
+            'no_warnings': True,
+        }
+        ffmpeg_location = get_ffmpeg_path()
+        if ffmpeg_location:
+            ydl_opts['ffmpeg_location'] = ffmpeg_location
+
+        def download_progress(percentage, speed):
+            if progress_callback:
+                progress_callback(percentage / 2, speed)
+
+        try:
+            info, source, fragment_report = _run_download(
+                url, ydl_opts, info, download_progress, cancel_check)
+            if not source:
+                raise Exception("No se encontró el archivo descargado")
+            title = info.get('title', 'Sin título')
+            thumbnail = pick_thumbnail(info.get('thumbnails'), *HISTORY_SIZE,
+                                       info.get('thumbnail', ''))
+            video_id = canonical_video_id(url, info)
+            base = os.path.splitext(os.path.splitext(source)[0])[0]
+            try:
+                converted = _transcode_targets(source, base, pending, info.get('duration'),
+                                               info.get('acodec'), progress_callback,
+                                               cancel_check, target_callback)
+            finally:
+                try:
+                    os.remove(source)
+                except OSError:
+                    pass
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            print(f"Error al descargar: {e}", file=sys.stderr)
+            return None
+
+        for fmt, result in converted.items():
+            if 'error' in result:
+                print(f"Error al convertir a {fmt}: {result['error']}", file=sys.stderr)
+                targets[fmt] = {'format': fmt, 'quality': quality, 'error': result['error']}
+                continue
+            archive.add(archive.archive_key(video_id, fmt, quality),
+                        title, result['file_path'], result['size_mb'],
+                        aliases=_url_aliases(url, video_id, fmt, quality))
+            targets[fmt] = dict(result, format=fmt, quality=quality, title=title,
+                                output_path=output_path, video_id=video_id)
+
+    done = [targets[fmt] for fmt in formats if 'error' not in targets[fmt]]
+    if not done:
+        return None
+    return {
+        'title': title,
+        'format': ','.join(formats),
+        'quality': quality,
+        'size_mb': round(sum(t.get('size_mb') or 0 for t in done), 2),
+        'elapsed_seconds': round(time.time() - start_time, 1),
+        'output_path': output_path,
+        'file_path': done[0]['file_path'],
+        'thumbnail_url': thumbnail,
+        'video_id': video_id,
+        'fragments': fragment_report,
+        'targets': {fmt: targets[fmt] for fmt in formats},
+        'transcoded': any(t.get('transcoded') for t in done),
+        'already_present': not pending,
+    }
@@ -0,0 +1,242 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from cancel import DownloadCancelled
+from config import load_config
+
+# Límites de fragmentos simultáneos por trabajo
+MIN_FRAGMENTS = 1
+MAX_FRAGMENTS = 16
+DEFAULT_FRAGMENTS = 4
+# Mejora de velocidad necesaria para seguir subiendo la concurrencia
+IMPROVEMENT_THRESHOLD = 1.10
+# Duración mínima de un stream para que su medición cuente
+MIN_SAMPLE_SECONDS = 1.0
+# Cada cuánto se mira la cancelación mientras se espera una conexión libre
+WAIT_INTERVAL = 0.2
+
+
+class ConnectionBudget:
+    # Conexiones de fragmentos de todo el proceso: con el presupuesto agotado, acquire espera a
+    # que otro trabajo libere alguna en vez de pasarse del total
+    def __init__(self, total: int):
+        self.total = max(MIN_FRAGMENTS, total)
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, wanted: int, cancel_check=None) -> int:
+        with self._cond:
+            while self.total - self.in_use < MIN_FRAGMENTS:
+                if cancel_check and cancel_check():
+                    raise DownloadCancelled()
+                self._cond.wait(WAIT_INTERVAL)
+            granted = max(MIN_FRAGMENTS, min(wanted, self.total - self.in_use))
+            self.in_use += granted
+            return granted
+
+    def exchange(self, held: int, wanted: int) -> int:
+        # Cambia las conexiones de un trabajo sin soltarlas antes: nunca se queda sin ninguna.
+        # Solo supera el total si resize lo ha bajado por debajo de lo ya concedido
+        with self._cond:
+            self.in_use -= held
+            granted = max(MIN_FRAGMENTS, min(wanted, self.total - self.in_use))
+            self.in_use += granted
+            self._cond.notify_all()
+            return granted
+
+    def regrant(self, held: int, wanted: int) -> int:
+        # Como exchange pero sin mínimo ni espera: 0 si no queda ninguna libre
+        with self._cond:
+            self.in_use -= held
+            granted = max(0, min(wanted, self.total - self.in_use))
+            self.in_use += granted
+            self._cond.notify_all()
+            return granted
+
+    def release(self, count: int):
+        with self._cond:
+            self.in_use = max(0, self.in_use - count)
+            self._cond.notify_all()
+
+    def resize(self, total: int):
+        with self._cond:
+            self.total = max(MIN_FRAGMENTS, total)
+            self._cond.notify_all()
+
+
+class BrokeredBudget(ConnectionBudget):
+    # Presupuesto de un worker: el total no es fijo sino lo que le concede el proceso principal
+    # (regrant sobre el presupuesto de verdad), según la demanda que este worker informa.
+    # Un worker ejecuta un trabajo cada vez, así que solo hay un FragmentController pidiendo
+    def __init__(self):
+        super().__init__(MIN_FRAGMENTS)
+        self.total = 0
+        self._pending = 0
+        self._unmet = 0
+
+    def acquire(self, wanted: int, cancel_check=None) -> int:
+        with self._cond:
+            self._pending += wanted
+        try:
+            granted = super().acquire(wanted, cancel_check)
+        finally:
+            with self._cond:
+                self._pending -= wanted
+        with self._cond:
+            self._unmet = max(0, wanted - granted)
+        return granted
+
+    def exchange(self, held: int, wanted: int) -> int:
+        granted = super().exchange(held, wanted)
+        with self._cond:
+            self._unmet = max(0, wanted - granted)
+        return granted
+
+    def release(self, count: int):
+        with self._cond:
+            self._unmet = 0
+        super().release(count)
+
+    def demand(self) -> int:
+        # Conexiones que quiere el trabajo: las que usa más las que espera o le faltaron
+        with self._cond:
+            return self.in_use + self._pending + self._unmet
+
+    def resize(self, total: int):
+        # Sin mínimo: con 0 concedidas, acquire espera a que el proceso principal libere alguna
+        with self._cond:
+            self.total = max(0, total)
+            self._cond.notify_all()
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+# Mejor concurrencia medida por host, compartida entre trabajos
+_learned = {}
+_learned_lock = threading.Lock()
+
+
+_local = threading.local()
+
+
+def get_connection_budget() -> ConnectionBudget:
+    global _budget
+    budget = getattr(_local, 'budget', None)
+    if budget is not None:
+        return budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = ConnectionBudget(load_config()['max_connections'])
+        return _budget
+
+
+@contextmanager
+def use_connection_budget(budget: ConnectionBudget):
+    previous = getattr(_local, 'budget', None)
+    _local.budget = budget
+    try:
+        yield budget
+    finally:
+        _local.budget = previous
+
+
+class FragmentController:
+    # yt-dlp fija los fragmentos simultáneos al empezar cada stream, así que la concurrencia se
+    # reajusta entre streams (vídeo, audio, siguiente trabajo del host), no a mitad de uno
+    def __init__(self, host: str, budget: ConnectionBudget = None,
+                 maximum: int = MAX_FRAGMENTS, cancel_check=None):
+        self.host = host or ''
+        self.budget = budget or get_connection_budget()
+        self.maximum = maximum
+        self.cancel_check = cancel_check
+        # Tiempo esperando a que el presupuesto tuviera una conexión libre
+        self.waited = 0.0
+        with _learned_lock:
+            self.wanted = _learned.get(self.host, DEFAULT_FRAGMENTS)
+        self.initial = self.wanted
+        self.granted = 0
+        self.peak = 0
+        self.samples = []
+        self._params = None
+        self._direction = 1
+        self._stream = None
+        self._released = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> int:
+        start = time.time()
+        granted = self.budget.acquire(self.wanted, self.cancel_check)
+        with self._lock:
+            self.waited += time.time() - start
+            self.granted = granted
+            self.peak = max(self.peak, self.granted)
+            return self.granted
+
+    def bind(self, params: dict):
+        # yt-dlp lee concurrent_fragment_downloads al empezar cada stream (vídeo, audio...)
+        self._params = params
+        params['concurrent_fragment_downloads'] = self.granted or self.acquire()
+
+    def on_progress(self, d: dict):
+        if not d.get('fragment_count'):
+            return
+        now = time.time()
+        with self._lock:
+            if d['status'] == 'downloading':
+                if self._stream is None or self._stream['filename'] != d.get('filename'):
+                    self._stream = {'filename': d.get('filename'), 'start': now,
+                                    'start_bytes': d.get('downloaded_bytes', 0)}
+                self._stream['bytes'] = d.get('downloaded_bytes', 0)
+                self._stream['last'] = now
+            elif d['status'] == 'finished' and self._stream is not None:
+                self._finish_stream()
+
+    def _finish_stream(self):
+        stream, self._stream = self._stream, None
+        elapsed = stream.get('last', stream['start']) - stream['start']
+        if elapsed < MIN_SAMPLE_SECONDS:
+            return
+        throughput = (stream.get('bytes', 0) - stream['start_bytes']) / elapsed
+        self.samples.append({'fragments': self.granted, 'throughput': round(throughput)})
+        self._retune(throughput)
+
+    def _retune(self, throughput: float):
+        # Búsqueda por escalada: se duplica mientras mejora y se vuelve al mejor valor si empeora
+        best = max(self.samples, key=lambda s: s['throughput'])['fragments']
+        wanted = self.granted
+        if len(self.samples) > 1:
+            previous = self.samples[-2]['throughput']
+            if throughput >= previous * IMPROVEMENT_THRESHOLD:
+                self._direction = 1
+            else:
+                self._direction = 0
+                if throughput * IMPROVEMENT_THRESHOLD <= previous:
+                    wanted = best
+        if self._direction > 0:
+            wanted = min(self.maximum, self.granted * 2)
+        with _learned_lock:
+            _learned[self.host] = best
+        if wanted != self.granted:
+            self.wanted = wanted
+            self.granted = self.budget.exchange(self.granted, wanted)
+            self.peak = max(self.peak, self.granted)
+            if self._params is not None:
+                self._params['concurrent_fragment_downloads'] = self.granted
+
+    def release(self):
+        with self._lock:
+            if not self._released:
+                self._released = True
+                self.budget.release(self.granted)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                'initial': self.initial,
+                'final': self.granted,
+                'peak': self.peak,
+                'waited_seconds': round(self.waited, 3),
+                'samples': list(self.samples),
+            }
@@ -4,21 +4,35 @@ import threading
 import os
 import sys
 import subprocess
-import requests
-from io import BytesIO
-from PIL import Image
 
 sys.path.insert(0, os.path.dirname(__file__))
-from downloader import get_video_info, download_video, AUDIO_FORMATS, VIDEO_FORMATS, AUDIO_QUALITIES
+from downloader import iter_playlist_entries, AUDIO_FORMATS, VIDEO_FORMATS, AUDIO_QUALITIES
+from job_queue import (DownloadQueue, Job, job_from_journal, PRIORITY_WEIGHTS, PENDING, RUNNING, DONE,
+                       FAILED, CANCELLED)
+from worker_pool import WorkerPool
+from progress_bus import ProgressBus
+from virtual_list import VirtualList
+from bandwidth import get_scheduler
+from thumbnails import ThumbnailLoader, PRIORITY_URGENT
+from thumb_select import SEARCH_SIZE, HISTORY_SIZE
+from thumb_cache import get_thumbnail_cache
+import journal
 from config import load_config, save_config, VIDEO_QUALITY_OPTIONS
 
-THUMB_W, THUMB_H           = 160, 90
-HIST_THUMB_W, HIST_THUMB_H = 96, 54
+THUMB_W, THUMB_H           = SEARCH_SIZE
+HIST_THUMB_W, HIST_THUMB_H = HISTORY_SIZE
+# Tarjetas del historial de alto fijo (la lista solo monta las que se ven) y separación
+HIST_ROW_H, HIST_ROW_GAP   = 100, 10
 
 ALL_VIDEO_FORMATS = ["mp4", "mkv", "avi", "webm", "mov"]
 ALL_AUDIO_FORMATS = ["mp3", "aac", "flac", "ogg", "wav", "m4a"]
 ALL_FORMATS_COMBO = ["── Vídeo ──"] + ALL_VIDEO_FORMATS + ["── Audio ──"] + ALL_AUDIO_FORMATS
 
+WORKER_OPTIONS = [str(n) for n in range(1, 9)]
+
+# Entradas de playlist pendientes en la cola mientras se sigue paginando
+PLAYLIST_PREFETCH = 10
+
 THEME_OPTIONS = ["dark", "light", "system"]
 THEME_LABELS  = {"dark": "Oscuro", "light": "Claro", "system": "Sistema"}
 THEME_REVERSE = {v: k for k, v in THEME_LABELS.items()}
@@ -54,26 +68,11 @@ def _is_light_mode() -> bool:
     return mode == "light"
 
 
-def load_image_from_url(url: str, width: int, height: int):
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        img = Image.open(BytesIO(response.content)).convert("RGB")
-        target_ratio = width / height
-        orig_w, orig_h = img.size
-        orig_ratio = orig_w / orig_h
-        if orig_ratio > target_ratio:
-            new_w = int(orig_h * target_ratio)
-            left = (orig_w - new_w) // 2
-            img = img.crop((left, 0, left + new_w, orig_h))
-        elif orig_ratio < target_ratio:
-            new_h = int(orig_w / target_ratio)
-            top = (orig_h - new_h) // 2
-            img = img.crop((0, top, orig_w, top + new_h))
-        img = img.resize((width, height), Image.LANCZOS)
-        return ctk.CTkImage(light_image=img, dark_image=img, size=(width, height))
-    except Exception:
-        return None
+def _widget_alive(widget) -> bool:
+    # Sin llamar a Tk (se consulta desde los hilos del cargador): destroy() saca al widget
+    # de los hijos de su padre, también cuando se destruye el padre
+    master = widget.master
+    return master is not None and master.children.get(widget._name) is widget
 
 
 def open_file_location(file_path: str, fallback_folder: str):
@@ -124,10 +123,25 @@ class App(ctk.CTk):
 
         self.output_path = self.config_data['default_output_path']
         self.video_info = None
-        self._cancel_download = False
         self._spinner_running = False
         self._current_thumb = None
+        self._thumb_url = None
         self._active_tab = "Descargar"
+        self._queue_rows = {}
+        self._completed_jobs = set()
+        # yt-dlp corre en procesos aparte: su extracción no bloquea el bucle de Tk
+        self.worker_pool = WorkerPool(self.config_data['max_concurrent_downloads'])
+        # Una sola actualización por trabajo y refresco, con velocidad y ETA suavizadas
+        self.progress_bus = ProgressBus(self.after, self._on_job_update)
+        # Sesión compartida y pocos hilos para todas las miniaturas; las ya vistas salen de disco
+        self.thumbnail_loader = ThumbnailLoader(self.after, cache=get_thumbnail_cache())
+        self.download_queue = DownloadQueue(
+            workers=self.config_data['max_concurrent_downloads'],
+            per_host=self.config_data['max_downloads_per_host'],
+            max_pending=PLAYLIST_PREFETCH,
+            use_journal=True,
+            runner=self.worker_pool.run_job,
+            on_update=self.progress_bus.publish)
 
         icon_path = os.path.join(os.path.dirname(__file__), '..', 'assets', 'icon.ico')
         if getattr(sys, 'frozen', False):
@@ -136,6 +150,8 @@ class App(ctk.CTk):
             self.iconbitmap(icon_path)
 
         self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(300, self._offer_resume)
 
     # ------------------------------------------------------------------ #
     #  UI BUILD / REBUILD
@@ -280,16 +296,20 @@ class App(ctk.CTk):
             fg_color=BTN_ACCENT_FG, hover_color=BTN_ACCENT_HOVER,
             command=self._on_select_folder).grid(row=2, column=2, padx=(4, 10), pady=10)
 
-        self.progress_bar = ctk.CTkProgressBar(tab, width=620)
-        self.progress_bar.pack(padx=10, pady=(10, 2))
-        self.progress_bar.set(0)
-
-        self.frame_status = ctk.CTkFrame(tab, fg_color="transparent")
-        self.frame_status.pack(fill="x", padx=10)
-        self.label_progress = ctk.CTkLabel(self.frame_status, text="0%")
-        self.label_progress.pack(side="left", padx=10)
-        self.label_speed = ctk.CTkLabel(self.frame_status, text="", text_color=GRAY_TEXT)
-        self.label_speed.pack(side="right", padx=10)
+        # Peso en el reparto del límite de descarga frente a las demás de la cola
+        ctk.CTkLabel(self.frame_options, text="Prioridad:").grid(
+            row=3, column=0, padx=10, pady=10, sticky="w")
+        self.combo_priority = ctk.CTkComboBox(
+            self.frame_options, values=list(PRIORITY_WEIGHTS), width=120, state="readonly")
+        self.combo_priority.set("Normal")
+        self.combo_priority.grid(row=3, column=1, padx=10, pady=10, sticky="w")
+
+        self.queue_frame = ctk.CTkScrollableFrame(
+            tab, height=110, label_text="Cola de descargas")
+        self.queue_frame.pack(padx=10, pady=(0, 4), fill="x")
+        self._queue_rows = {}
+        for job in list(self.download_queue.jobs.values()):
+            self._build_queue_row(job)
 
         self.label_status = ctk.CTkLabel(tab, text="", text_color=GRAY_TEXT)
         self.label_status.pack()
@@ -313,8 +333,13 @@ class App(ctk.CTk):
             command=self._on_clear_history)
         self.btn_clear.pack(padx=10, pady=(10, 5), anchor="e")
 
-        self.history_frame = ctk.CTkScrollableFrame(tab)
-        self.history_frame.pack(padx=10, pady=5, fill="both", expand=True)
+        from history import count_history, query_history, history_anchor
+        self.history_list = VirtualList(
+            tab, HIST_ROW_H + HIST_ROW_GAP,
+            create_row=self._create_history_row, bind_row=self._bind_history_row,
+            count=count_history, fetch=query_history, seek=history_anchor, on_visible=self._on_history_visible,
+            empty_text="No hay descargas registradas.", fg_color="transparent")
+        self.history_list.pack(padx=10, pady=5, fill="both", expand=True)
         self._refresh_history()
 
     # ------------------------------------------------------------------ #
@@ -343,6 +368,17 @@ class App(ctk.CTk):
         self.switch_open_folder.grid(row=row, column=1, padx=10, pady=8, sticky="w")
         row += 1
 
+        ctk.CTkLabel(scroll, text="Mezclar vídeo y audio al descargar (sin temporales):",
+                     anchor="w").grid(row=row, column=0, padx=10, pady=8, sticky="w")
+        self.switch_stream_merge = ctk.CTkSwitch(scroll, text="")
+        if self.config_data['stream_merge']:
+            self.switch_stream_merge.select()
+        if os.name != 'posix':
+            # Necesita pasar pipes a ffmpeg (pass_fds), que no existe en Windows
+            self.switch_stream_merge.configure(state="disabled")
+        self.switch_stream_merge.grid(row=row, column=1, padx=10, pady=8, sticky="w")
+        row += 1
+
         ctk.CTkLabel(scroll, text="Carpeta de descarga por defecto:",
                      anchor="w").grid(row=row, column=0, padx=10, pady=8, sticky="w")
         frame_folder = ctk.CTkFrame(scroll, fg_color="transparent")
@@ -413,6 +449,37 @@ class App(ctk.CTk):
             row=row, column=0, columnspan=2, padx=10, pady=8, sticky="ew")
         row += 1
 
+        ctk.CTkLabel(scroll, text="Cola de descargas",
+                     font=ctk.CTkFont(size=14, weight="bold"), anchor="w").grid(
+            row=row, column=0, columnspan=2, padx=10, pady=(4, 4), sticky="w")
+        row += 1
+
+        ctk.CTkLabel(scroll, text="Descargas simultáneas:", anchor="w").grid(
+            row=row, column=0, padx=10, pady=8, sticky="w")
+        self.combo_workers = ctk.CTkComboBox(scroll, values=WORKER_OPTIONS, width=80)
+        self.combo_workers.set(str(self.config_data['max_concurrent_downloads']))
+        self.combo_workers.grid(row=row, column=1, padx=10, pady=8, sticky="w")
+        row += 1
+
+        ctk.CTkLabel(scroll, text="Máximo por servidor:", anchor="w").grid(
+            row=row, column=0, padx=10, pady=8, sticky="w")
+        self.combo_per_host = ctk.CTkComboBox(scroll, values=WORKER_OPTIONS, width=80)
+        self.combo_per_host.set(str(self.config_data['max_downloads_per_host']))
+        self.combo_per_host.grid(row=row, column=1, padx=10, pady=8, sticky="w")
+        row += 1
+
+        # Se reparte entre las descargas activas; las franjas horarias van en config.json
+        ctk.CTkLabel(scroll, text="Límite de descarga (KB/s, 0 = sin límite):", anchor="w").grid(
+            row=row, column=0, padx=10, pady=8, sticky="w")
+        self.entry_bandwidth = ctk.CTkEntry(scroll, width=80)
+        self.entry_bandwidth.insert(0, str(self.config_data['bandwidth_limit_kbps']))
+        self.entry_bandwidth.grid(row=row, column=1, padx=10, pady=8, sticky="w")
+        row += 1
+
+        ctk.CTkFrame(scroll, height=1, fg_color=("gray70", "gray30")).grid(
+            row=row, column=0, columnspan=2, padx=10, pady=8, sticky="ew")
+        row += 1
+
         self.btn_save_config = ctk.CTkButton(
             scroll, text="Guardar configuración", width=220,
             fg_color=BTN_MAIN_FG, hover_color=BTN_MAIN_HOVER,
@@ -445,14 +512,18 @@ class App(ctk.CTk):
     # ------------------------------------------------------------------ #
 
     def _load_thumbnail_async(self, url: str):
-        def _fetch():
-            img = load_image_from_url(url, THUMB_W, THUMB_H)
-            if img:
-                self._current_thumb = img
-                self.after(0, lambda: self.thumb_label.configure(image=img, text=""))
-        threading.Thread(target=_fetch, daemon=True).start()
+        # Una búsqueda posterior (o limpiar el formulario) descarta esta miniatura
+        self._thumb_url = url
+        self.thumbnail_loader.request(
+            url, THUMB_W, THUMB_H, self._show_thumbnail,
+            alive=lambda: self._thumb_url == url, priority=PRIORITY_URGENT)
+
+    def _show_thumbnail(self, img):
+        self._current_thumb = ctk.CTkImage(light_image=img, dark_image=img, size=(THUMB_W, THUMB_H))
+        self.thumb_label.configure(image=self._current_thumb, text="")
 
     def _clear_thumbnail(self):
+        self._thumb_url = None
         self._current_thumb = None
         self.thumb_label.configure(image=None, text="")
 
@@ -461,69 +532,78 @@ class App(ctk.CTk):
     # ------------------------------------------------------------------ #
 
     def _refresh_history(self):
-        for widget in self.history_frame.winfo_children():
-            widget.destroy()
-        from history import load_history
-        history = load_history()
-        if not history:
-            ctk.CTkLabel(self.history_frame, text="No hay descargas registradas.",
-                         anchor="w").pack(padx=10, pady=20)
-            return
-        for entry in history:
-            self._build_history_card(entry)
+        self.history_list.refresh()
 
-    def _build_history_card(self, entry: dict):
-        frame = ctk.CTkFrame(self.history_frame)
-        frame.pack(padx=5, pady=5, fill="x")
+    def _create_history_row(self, parent) -> dict:
+        # Widgets de una tarjeta; la lista los reutiliza para otras entradas al desplazarse
+        frame = ctk.CTkFrame(parent, height=HIST_ROW_H)
+        frame.grid_propagate(False)
         frame.columnconfigure(1, weight=1)
 
-        title     = entry.get('title', '-')
-        fmt       = entry.get('format', '-')
-        quality   = entry.get('quality', '-')
-        size      = entry.get('size_mb', '-')
-        elapsed   = entry.get('elapsed_seconds', '-')
-        date      = entry.get('date', '-')
-        path      = entry.get('output_path', '-')
-        file_path = entry.get('file_path')
-        thumb_url = entry.get('thumbnail_url')
-
-        thumb_lbl = ctk.CTkLabel(
+        thumb = ctk.CTkLabel(
             frame, text="", width=HIST_THUMB_W, height=HIST_THUMB_H,
             fg_color="transparent", corner_radius=6)
-        thumb_lbl.grid(row=0, column=0, rowspan=3, padx=(10, 10), pady=10, sticky="ns")
-
-        if thumb_url:
-            def _fetch(url=thumb_url, lbl=thumb_lbl):
-                img = load_image_from_url(url, HIST_THUMB_W, HIST_THUMB_H)
-                if img:
-                    self.after(0, lambda: lbl.configure(image=img, text=""))
-            threading.Thread(target=_fetch, daemon=True).start()
+        thumb.grid(row=0, column=0, rowspan=3, padx=(10, 10), pady=10, sticky="ns")
 
         row_top = ctk.CTkFrame(frame, fg_color="transparent")
         row_top.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=(10, 2))
         row_top.columnconfigure(0, weight=1)
 
-        ctk.CTkLabel(row_top, text=f"🎬 {title}",
-                     font=ctk.CTkFont(weight="bold"), anchor="w",
-                     wraplength=400).grid(row=0, column=0, sticky="ew")
+        title = ctk.CTkLabel(row_top, text="", font=ctk.CTkFont(weight="bold"), anchor="w")
+        title.grid(row=0, column=0, sticky="ew")
 
-        ctk.CTkButton(
+        btn_open = ctk.CTkButton(
             row_top, text="📂 Abrir", width=80, height=26,
             fg_color="transparent", border_width=1,
             text_color=("gray40", "gray70"),
-            hover_color=("gray85", "gray25"),
-            command=lambda fp=file_path, p=path: open_file_location(fp, p)
-        ).grid(row=0, column=1, padx=(6, 0))
+            hover_color=("gray85", "gray25"))
+        btn_open.grid(row=0, column=1, padx=(6, 0))
+
+        details = ctk.CTkLabel(frame, text="", anchor="w", text_color=GRAY_TEXT)
+        details.grid(row=1, column=1, sticky="ew", padx=(0, 10), pady=(0, 2))
 
-        ctk.CTkLabel(
-            frame,
-            text=f"📅 {date}   •   {fmt}   •   {quality}   •   {size} MB   •   {elapsed}s",
-            anchor="w", text_color=GRAY_TEXT).grid(
-            row=1, column=1, sticky="ew", padx=(0, 10), pady=(0, 2))
+        path = ctk.CTkLabel(frame, text="", anchor="w", text_color=GRAY_TEXT)
+        path.grid(row=2, column=1, sticky="ew", padx=(0, 10), pady=(0, 10))
 
-        ctk.CTkLabel(frame, text=f"📁 {path}", anchor="w",
-                     text_color=GRAY_TEXT, wraplength=480).grid(
-            row=2, column=1, sticky="ew", padx=(0, 10), pady=(0, 10))
+        return {'frame': frame, 'thumb': thumb, 'title': title, 'open': btn_open,
+                'details': details, 'path': path, 'entry_id': None, 'thumb_key': None}
+
+    def _bind_history_row(self, row: dict, entry: dict):
+        title     = entry.get('title', '-')
+        fmt       = entry.get('format', '-')
+        quality   = entry.get('quality', '-')
+        size      = entry.get('size_mb', '-')
+        elapsed   = entry.get('elapsed_seconds', '-')
+        date      = entry.get('date', '-')
+        path      = entry.get('output_path', '-')
+        file_path = entry.get('file_path')
+        thumb_url = entry.get('thumbnail_url')
+
+        # Alto fijo: título y carpeta en una sola línea
+        title = title if len(title) <= 60 else title[:57] + "..."
+        path_text = path if len(path) <= 75 else "..." + path[-72:]
+        row['title'].configure(text=f"🎬 {title}")
+        row['open'].configure(command=lambda fp=file_path, p=path: open_file_location(fp, p))
+        row['details'].configure(
+            text=f"📅 {date}   •   {fmt}   •   {quality}   •   {size} MB   •   {elapsed}s")
+        row['path'].configure(text=f"📁 {path_text}")
+
+        row['entry_id'] = entry_id = entry.get('id')
+        row['thumb'].configure(image=None, text="")
+        row['thumb_key'] = None
+        if thumb_url:
+            def _show(img, lbl=row['thumb']):
+                lbl.configure(image=ctk.CTkImage(light_image=img, dark_image=img,
+                                                 size=(HIST_THUMB_W, HIST_THUMB_H)), text="")
+            # Si la fila se reutiliza para otra entrada (o se reconstruye la interfaz) antes de
+            # que llegue, se descarta
+            row['thumb_key'] = self.thumbnail_loader.request(
+                thumb_url, HIST_THUMB_W, HIST_THUMB_H, _show,
+                alive=lambda: row['entry_id'] == entry_id and _widget_alive(row['thumb']))
+
+    def _on_history_visible(self, rows: list):
+        # Las miniaturas de las tarjetas a la vista se descargan antes que las del margen
+        self.thumbnail_loader.prioritize(row['thumb_key'] for row in rows if row['thumb_key'])
 
     def _on_clear_history(self):
         from history import clear_history
@@ -550,16 +630,29 @@ class App(ctk.CTk):
 
     def _on_save_config(self):
         theme = THEME_REVERSE.get(self.combo_theme.get(), "dark")
-        new_config = {
+        new_config = dict(self.config_data)
+        new_config.update({
             'open_folder_after_download': self.switch_open_folder.get() == 1,
+            'stream_merge': self.switch_stream_merge.get() == 1,
             'default_output_path': self.entry_default_folder.get().strip(),
             'theme': theme,
             'default_format': self.combo_default_format.get(),
             'default_quality_video': self.combo_default_video_quality.get(),
             'default_quality_audio': self.combo_default_audio_quality.get(),
-        }
+            'max_concurrent_downloads': self._int_option(
+                self.combo_workers.get(), self.config_data['max_concurrent_downloads']),
+            'max_downloads_per_host': self._int_option(
+                self.combo_per_host.get(), self.config_data['max_downloads_per_host']),
+            'bandwidth_limit_kbps': self._limit_option(
+                self.entry_bandwidth.get(), self.config_data['bandwidth_limit_kbps']),
+        })
         save_config(new_config)
         self.config_data = new_config
+        get_scheduler().configure(new_config['bandwidth_limit_kbps'],
+                                  new_config['bandwidth_profiles'])
+        self.worker_pool.resize(new_config['max_concurrent_downloads'])
+        self.download_queue.set_limits(new_config['max_concurrent_downloads'],
+                                       new_config['max_downloads_per_host'])
 
         self.output_path = new_config['default_output_path']
         self.entry_folder.delete(0, "end")
@@ -570,6 +663,20 @@ class App(ctk.CTk):
         self.btn_save_config.configure(text="✓ Guardado")
         self.after(2000, lambda: self.btn_save_config.configure(text="Guardar configuración"))
 
+    @staticmethod
+    def _int_option(value, fallback):
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            return fallback
+
+    @staticmethod
+    def _limit_option(value, fallback):
+        try:
+            return max(0, int(value.strip() or 0))
+        except (TypeError, ValueError):
+            return fallback
+
     # ------------------------------------------------------------------ #
     #  FORMATO / CALIDAD
     # ------------------------------------------------------------------ #
@@ -617,12 +724,19 @@ class App(ctk.CTk):
 
         def search_thread():
             try:
-                info = get_video_info(url)
+                info = self.worker_pool.fetch_info(url)
+                if info.get('is_playlist'):
+                    # Las calidades reales dependen de cada vídeo: se ofrecen las genéricas
+                    info = dict(info, formats=VIDEO_QUALITY_OPTIONS)
+                    count = info.get('playlist_count')
+                    duration_str = "-"
+                    qualities_str = f"Playlist ({count} vídeos)" if count else "Playlist"
+                else:
+                    minutes = info['duration'] // 60
+                    secs = info['duration'] % 60
+                    duration_str = f"{minutes}:{secs:02d}"
+                    qualities_str = "  •  ".join(info['formats']) if info['formats'] else "-"
                 self.video_info = info
-                minutes = info['duration'] // 60
-                secs = info['duration'] % 60
-                duration_str = f"{minutes}:{secs:02d}"
-                qualities_str = "  •  ".join(info['formats']) if info['formats'] else "-"
                 self.after(0, lambda: self._update_info(
                     info['title'], info.get('uploader', '-'),
                     duration_str, qualities_str, info['formats']))
@@ -665,76 +779,207 @@ class App(ctk.CTk):
     #  DESCARGAR
     # ------------------------------------------------------------------ #
 
-    def _on_cancel(self):
-        self._cancel_download = True
-        self.label_status.configure(text="Cancelando...")
-
     def _on_download(self):
-        if not self.video_info:
-            messagebox.showwarning("Aviso", "Primero busca un vídeo.")
-            return
-        url = self.entry_url.get().strip()
+        urls = self.entry_url.get().split()
         quality = self.combo_quality.get()
         output_format = self.combo_format.get()
         output_path = self.entry_folder.get().strip()
+        weight = PRIORITY_WEIGHTS.get(self.combo_priority.get(), 1.0)
 
+        if not urls:
+            messagebox.showwarning("Aviso", "Por favor introduce una URL.")
+            return
         if output_format.startswith("──"):
             messagebox.showwarning("Aviso", "Selecciona un formato válido.")
             return
 
-        self._cancel_download = False
-        self.btn_download.configure(
-            text="Cancelar", fg_color=("gray60", "gray35"),
-            hover_color=("gray50", "gray25"), command=self._on_cancel)
-        self.progress_bar.set(0)
-        self.label_progress.configure(text="0%")
-        self.label_speed.configure(text="")
-        self.label_status.configure(text="Iniciando descarga...")
-
-        def progress_callback(percentage, speed):
-            if self._cancel_download:
+        if len(urls) == 1:
+            if not self.video_info:
+                messagebox.showwarning("Aviso", "Primero busca un vídeo.")
                 return
-            self.after(0, lambda: self.progress_bar.set(percentage / 100))
-            self.after(0, lambda: self.label_progress.configure(text=f"{int(percentage)}%"))
-            if speed and speed > 0:
-                speed_str = (f"{speed / (1024*1024):.1f} MB/s"
-                             if speed >= 1024 * 1024
-                             else f"{speed / 1024:.0f} KB/s")
-                self.after(0, lambda: self.label_speed.configure(text=speed_str))
-            if percentage == 100:
-                self.after(0, lambda: self.label_status.configure(text="Procesando archivo..."))
-                self.after(0, lambda: self.label_speed.configure(text=""))
-
-        def download_thread():
-            from history import save_entry, build_entry
-            result = download_video(url, quality, output_format, output_path,
-                                    progress_callback, lambda: self._cancel_download)
-            if self._cancel_download:
-                self.after(0, lambda: self.label_status.configure(text="✗ Descarga cancelada"))
-                self.after(0, lambda: self.progress_bar.set(0))
-                self.after(0, lambda: self.label_progress.configure(text="0%"))
-            elif result:
-                save_entry(build_entry(result))
-                self.after(0, self._refresh_history)
-                self.after(0, lambda: self.label_status.configure(text="✓ Descarga completada"))
-                self.after(0, self._reset_form)
-                if self.config_data.get('open_folder_after_download'):
-                    self.after(500, lambda: open_folder(output_path))
-                msg = (f"Descarga completada.\n\n"
-                       f"Formato: {result['format'].upper()}\n"
-                       f"Calidad: {result['quality']}\n"
-                       f"Peso: {result['size_mb']} MB\n"
-                       f"Tiempo: {result['elapsed_seconds']}s\n"
-                       f"Carpeta: {result['output_path']}")
-                self.after(0, lambda: messagebox.showinfo("Completado", msg))
+            if self.video_info.get('is_playlist'):
+                self._enqueue_playlist(urls[0], quality, output_format, output_path, weight)
+                self._reset_form()
+                return
+            jobs = [Job(urls[0], quality, output_format, output_path,
+                        title=self.video_info['title'], weight=weight)]
+        else:
+            # Varias URLs: se encolan sin buscar, con la calidad por defecto si no hay una válida
+            if not self._is_audio_format(output_format) and not quality.endswith('p'):
+                quality = self.config_data.get('default_quality_video', 'Mejor disponible')
+            jobs = [Job(u, quality, output_format, output_path, weight=weight) for u in urls]
+
+        for job in jobs:
+            self.download_queue.submit(job, wait=False)
+        self.label_status.configure(
+            text=f"{len(jobs)} descarga(s) añadida(s) a la cola" if len(jobs) > 1
+            else "Descarga añadida a la cola")
+        self._reset_form()
+
+    def _enqueue_playlist(self, url, quality, output_format, output_path, weight=1.0, start=0):
+        self.label_status.configure(text="Leyendo playlist...")
+
+        def producer():
+            count = 0
+            try:
+                # submit() bloquea con PLAYLIST_PREFETCH pendientes: el listado avanza al ritmo de la cola
+                for entry in iter_playlist_entries(url, start):
+                    self.download_queue.submit(Job(
+                        entry['url'], quality, output_format, output_path,
+                        title=entry['title'], playlist_index=entry['index'], weight=weight))
+                    count += 1
+                    text = f"Playlist: {count} vídeo(s) añadidos a la cola..."
+                    self.after(0, lambda t=text: self.label_status.configure(text=t))
+                text = f"Playlist completa: {count} vídeo(s) añadidos a la cola"
+            except Exception as e:
+                text = f"✗ Error al leer la playlist: {e}"
+            self.after(0, lambda: self.label_status.configure(text=text))
+
+        threading.Thread(target=producer, daemon=True).start()
+
+    def _offer_resume(self):
+        try:
+            entries = journal.load_unfinished()
+        except OSError:
+            return
+        if not entries:
+            return
+        if messagebox.askyesno(
+                "Descargas sin terminar",
+                f"Hay {len(entries)} descarga(s) que no llegaron a terminar.\n"
+                "¿Quieres reanudarlas? Se aprovechará lo ya descargado."):
+            for entry in entries:
+                self.download_queue.submit(job_from_journal(entry), wait=False)
+            self.label_status.configure(text=f"{len(entries)} descarga(s) reanudada(s)")
+        else:
+            journal.discard(entry['job'] for entry in entries)
+        journal.compact()
+
+    def _on_close(self):
+        self.worker_pool.shutdown()
+        self.destroy()
+
+    # ------------------------------------------------------------------ #
+    #  COLA DE DESCARGAS
+    # ------------------------------------------------------------------ #
+
+    def _build_queue_row(self, job: Job):
+        frame = ctk.CTkFrame(self.queue_frame)
+        frame.pack(padx=2, pady=3, fill="x")
+        frame.columnconfigure(0, weight=1)
+
+        title = job.title if len(job.title) <= 70 else job.title[:67] + "..."
+        ctk.CTkLabel(frame, text=title, anchor="w",
+                     font=ctk.CTkFont(size=12, weight="bold")).grid(
+            row=0, column=0, padx=(8, 4), pady=(4, 0), sticky="ew")
+
+        btn = ctk.CTkButton(
+            frame, text="✕", width=28, height=24,
+            fg_color="transparent", border_width=1,
+            text_color=("gray40", "gray70"),
+            hover_color=("gray85", "gray25"),
+            command=lambda jid=job.id: self._on_queue_row_button(jid))
+        btn.grid(row=0, column=1, rowspan=2, padx=(4, 8), pady=4)
+
+        bar = ctk.CTkProgressBar(frame)
+        bar.grid(row=1, column=0, padx=(8, 4), pady=2, sticky="ew")
+        bar.set(0)
+
+        status = ctk.CTkLabel(frame, text="", anchor="w", text_color=GRAY_TEXT,
+                              font=ctk.CTkFont(size=11))
+        status.grid(row=2, column=0, columnspan=2, padx=8, pady=(0, 4), sticky="ew")
+
+        self._queue_rows[job.id] = {'frame': frame, 'bar': bar, 'status': status}
+        self._update_queue_row(job, self.progress_bus.stats(job.id))
+
+    def _update_queue_row(self, job: Job, stats=None):
+        row = self._queue_rows.get(job.id)
+        if row is None:
+            return
+        if job.state == PENDING:
+            text = "En cola"
+        elif job.state == RUNNING:
+            if job.progress >= 100 and job.postprocess_progress is not None:
+                text = f"Recodificando vídeo   •   {int(job.postprocess_progress)}%"
+            elif job.progress >= 100 and job.plan and job.plan.get('cost') == 'video':
+                text = "Recodificando vídeo..."
+                if job.plan.get('estimated_seconds'):
+                    text += f" (~{int(job.plan['estimated_seconds'])}s)"
+            elif job.progress >= 100:
+                text = "Procesando archivo..."
             else:
-                self.after(0, lambda: self.label_status.configure(text="✗ Error en la descarga"))
-                self.after(0, lambda: messagebox.showerror("Error", "No se pudo descargar el vídeo."))
-            self.after(0, lambda: self.btn_download.configure(
-                text="Descargar", fg_color=BTN_MAIN_FG,
-                hover_color=BTN_MAIN_HOVER, command=self._on_download))
+                text = f"{int(job.progress)}%"
+                speed = stats.speed if stats and stats.speed else job.speed
+                if speed and speed > 0:
+                    text += f"   •   {self._format_speed(speed)}"
+                eta = stats.eta(job.progress) if stats else None
+                if eta is not None:
+                    text += f"   •   {self._format_eta(eta)}"
+        elif job.state == DONE and job.result.get('already_present'):
+            text = "✓ Ya descargado anteriormente"
+        elif job.state == DONE:
+            text = (f"✓ Completada   •   {job.result['size_mb']} MB"
+                    f"   •   {job.result['elapsed_seconds']}s")
+        elif job.state == CANCELLED:
+            text = "✗ Cancelada"
+        else:
+            text = f"✗ Error: {job.error or 'desconocido'}"
+        row['status'].configure(text=text)
+        if job.state == DONE:
+            row['bar'].set(1)
+        elif job.state == CANCELLED:
+            row['bar'].set(0)
+        else:
+            row['bar'].set(job.progress / 100)
+
+    @staticmethod
+    def _format_speed(speed):
+        return (f"{speed / (1024*1024):.1f} MB/s"
+                if speed >= 1024 * 1024
+                else f"{speed / 1024:.0f} KB/s")
+
+    @staticmethod
+    def _format_eta(seconds):
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"quedan {hours}:{minutes:02d}:{secs:02d}"
+        return f"quedan {minutes}:{secs:02d}"
+
+    def _on_job_update(self, job: Job, stats=None):
+        if job.id not in self._queue_rows and job.id in self.download_queue.jobs:
+            self._build_queue_row(job)
+        else:
+            self._update_queue_row(job, stats)
 
-        threading.Thread(target=download_thread, daemon=True).start()
+        if job.state == DONE and job.result.get('already_present'):
+            self._completed_jobs.add(job.id)
+            self.label_status.configure(text=f"✓ Ya descargado: {job.result['title']}")
+        elif job.state == DONE and job.id not in self._completed_jobs:
+            self._completed_jobs.add(job.id)
+            from history import save_entry, build_entry
+            save_entry(build_entry(job.result))
+            self._refresh_history()
+            self.label_status.configure(text=f"✓ Descarga completada: {job.result['title']}")
+            if self.config_data.get('open_folder_after_download'):
+                self.after(500, lambda: open_folder(job.output_path))
+        elif job.state == FAILED and job.id not in self._completed_jobs:
+            self._completed_jobs.add(job.id)
+            self.label_status.configure(text="✗ Error en la descarga")
+
+    def _on_queue_row_button(self, job_id: int):
+        job = self.download_queue.jobs.get(job_id)
+        if job is None or job.finished:
+            # Trabajo terminado: el botón retira la fila de la cola
+            self.download_queue.remove(job_id)
+            row = self._queue_rows.pop(job_id, None)
+            if row:
+                row['frame'].destroy()
+            return
+        self.download_queue.cancel(job_id)
+        row = self._queue_rows.get(job_id)
+        if row:
+            row['status'].configure(text="Cancelando...")
 
     def _reset_form(self):
         self.entry_url.delete(0, "end")
@@ -746,8 +991,6 @@ class App(ctk.CTk):
         self._clear_thumbnail()
         self.combo_quality.configure(values=["Busca un vídeo primero"])
         self.combo_quality.set("Busca un vídeo primero")
-        self.progress_bar.set(0)
-        self.label_progress.configure(text="0%")
 
 
 def main():
@@ -1,33 +1,191 @@
 import json
 import os
+import sqlite3
+import threading
+import time
 from datetime import datetime
 
 APP_NAME = "YouTubeDownloader"
 DATA_DIR = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser("~")), APP_NAME)
 os.makedirs(DATA_DIR, exist_ok=True)
 HISTORY_FILE = os.path.join(DATA_DIR, 'history.json')
+HISTORY_DB = os.path.join(DATA_DIR, 'history.db')
 
+DATE_FORMAT = '%d/%m/%Y %H:%M'
+# Espera máxima por el bloqueo de escritura de otro proceso (GUI, CLI, workers)
+BUSY_TIMEOUT = 10
+SCHEMA_VERSION = 1
 
-def load_history() -> list:
+# La entrada completa va en data (JSON); las columnas son solo para filtrar y ordenar
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    title TEXT,
+    format TEXT,
+    video_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_created ON history(created);
+CREATE INDEX IF NOT EXISTS history_format ON history(format);
+CREATE INDEX IF NOT EXISTS history_video_id ON history(video_id);
+-- La búsqueda es LIKE '%texto%' y ningún índice la sirve: solo encarecía cada inserción
+DROP INDEX IF EXISTS history_title;
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _created(entry: dict) -> float:
+    try:
+        return datetime.strptime(entry['date'], DATE_FORMAT).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def _insert(conn, entry: dict):
+    conn.execute(
+        "INSERT INTO history (created, title, format, video_id, data) VALUES (?, ?, ?, ?, ?)",
+        (_created(entry), entry.get('title'), entry.get('format'), entry.get('video_id'),
+         json.dumps(entry, ensure_ascii=False)))
+
+
+def _migrate(conn):
+    # Una sola vez: el history.json de versiones anteriores (de más nuevo a más antiguo)
     if not os.path.exists(HISTORY_FILE):
-        return []
+        return
     try:
         with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            entries = json.load(f)
     except Exception:
+        entries = []
+    for entry in reversed(entries if isinstance(entries, list) else []):
+        if isinstance(entry, dict):
+            _insert(conn, entry)
+
+
+def _setup(conn):
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn.execute("PRAGMA journal_mode=WAL")
+        # BEGIN IMMEDIATE: si dos procesos arrancan a la vez, solo uno migra
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in _SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                _migrate(conn)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if os.path.exists(HISTORY_FILE):
+            try:
+                os.replace(HISTORY_FILE, HISTORY_FILE + '.migrated')
+            except OSError:
+                pass
+        _initialized = True
+
+
+def _connection():
+    # Una conexión por hilo; WAL permite leer mientras otro proceso escribe
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(HISTORY_DB, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _setup(conn)
+        _local.conn = conn
+    return conn
+
+
+def _where(fmt: str = None, search: str = None, video_id: str = None,
+           since: float = None, until: float = None, before: int = None):
+    clauses, params = [], []
+    if fmt:
+        clauses.append("format = ?")
+        params.append(fmt.upper())
+    if search:
+        clauses.append("title LIKE ? ESCAPE '\\'")
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.append(f"%{escaped}%")
+    if video_id:
+        clauses.append("video_id = ?")
+        params.append(video_id)
+    if since is not None:
+        clauses.append("created >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created < ?")
+        params.append(until)
+    if before is not None:
+        clauses.append("id < ?")
+        params.append(before)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _entry(row) -> dict:
+    entry = json.loads(row[1])
+    entry['id'] = row[0]
+    return entry
+
+
+def query_history(before: int = None, limit: int = 50, **filters) -> list:
+    # Una página, de la más reciente a la más antigua, empezando después de la entrada con id
+    # 'before' (None: desde el principio). Paginación por clave: cualquier página cuesta lo
+    # mismo. Filtros: fmt, search (en el título), video_id, since/until (timestamps)
+    where, params = _where(before=before, **filters)
+    try:
+        rows = _connection().execute(
+            f"SELECT id, data FROM history{where} ORDER BY id DESC LIMIT ?",
+            params + [limit]).fetchall()
+    except sqlite3.Error:
+        return []
+    return [_entry(row) for row in rows]
+
+
+def history_anchor(before: int = None, skip: int = 0, **filters):
+    # id de la entrada que va 'skip' posiciones después de 'before' (0: la siguiente), para
+    # saltar a una página sin haber leído las anteriores. Solo recorre ids, no los datos
+    where, params = _where(before=before, **filters)
+    try:
+        row = _connection().execute(
+            f"SELECT id FROM history{where} ORDER BY id DESC LIMIT 1 OFFSET ?",
+            params + [skip]).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def count_history(**filters) -> int:
+    where, params = _where(**filters)
+    try:
+        return _connection().execute(f"SELECT COUNT(*) FROM history{where}",
+                                     params).fetchone()[0]
+    except sqlite3.Error:
+        return 0
+
+
+def load_history() -> list:
+    try:
+        rows = _connection().execute("SELECT id, data FROM history ORDER BY id DESC").fetchall()
+    except sqlite3.Error:
         return []
+    return [_entry(row) for row in rows]
 
 
 def save_entry(entry: dict):
-    history = load_history()
-    history.insert(0, entry)
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    _insert(_connection(), entry)
 
 
 def clear_history():
-    if os.path.exists(HISTORY_FILE):
-        os.remove(HISTORY_FILE)
+    _connection().execute("DELETE FROM history")
 
 
 def build_entry(result: dict) -> dict:
@@ -40,5 +198,6 @@ def build_entry(result: dict) -> dict:
         'output_path': result['output_path'],
         'file_path': result.get('file_path'),
         'thumbnail_url': result.get('thumbnail_url'),
-        'date': datetime.now().strftime('%d/%m/%Y %H:%M')
-    }
\ No newline at end of file
+        'video_id': result.get('video_id'),
+        'date': datetime.now().strftime(DATE_FORMAT)
+    }
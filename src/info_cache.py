@@ -0,0 +1,151 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+from config import DATA_DIR, load_config
+
+INFO_CACHE_FILE = os.path.join(DATA_DIR, 'info_cache.json')
+
+# Extracciones completas que se guardan solo en memoria (sus URLs firmadas caducan)
+MAX_RAW_ENTRIES = 32
+
+# youtube.com/watch?v=ID, youtu.be/ID, /shorts/ID, /embed/ID, /live/ID, /v/ID
+_YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube(?:-nocookie)?\.com/(?:.*[?&]v=|(?:shorts|embed|live|v)/)|youtu\.be/)'
+    r'([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])')
+
+
+def video_key(url: str) -> str:
+    url = url.strip()
+    match = _YOUTUBE_ID_RE.search(url)
+    if match:
+        return f"youtube:{match.group(1)}"
+    parts = urlsplit(url)
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
+    return f"url:{normalized}"
+
+
+class InfoCache:
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._raw = OrderedDict()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, entry in data.get('entries', {}).items():
+                self._entries[key] = entry
+        except Exception:
+            self._entries.clear()
+
+    def _save(self):
+        # Temporal propio de cada proceso e hilo: la interfaz y los workers guardan a la vez
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get('ts', 0) < self.ttl_seconds
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(entry):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['data']
+
+    def put(self, key: str, data: dict):
+        with self._lock:
+            self._entries[key] = {'ts': time.time(), 'data': data}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            try:
+                self._save()
+            except Exception:
+                pass
+
+    def get_raw(self, key: str):
+        with self._lock:
+            info = self._raw.get(key)
+            if info is not None:
+                self._raw.move_to_end(key)
+            return info
+
+    def put_raw(self, key: str, info: dict):
+        with self._lock:
+            self._raw[key] = info
+            self._raw.move_to_end(key)
+            while len(self._raw) > MAX_RAW_ENTRIES:
+                self._raw.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._raw.pop(key, None)
+            if self._entries.pop(key, None) is not None:
+                try:
+                    self._save()
+                except Exception:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._raw.clear()
+            self.hits = 0
+            self.misses = 0
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_info_cache() -> InfoCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = load_config()
+            _cache = InfoCache(INFO_CACHE_FILE,
+                               ttl_seconds=config['info_cache_ttl_hours'] * 3600,
+                               max_entries=config['info_cache_max_entries'])
+        return _cache
@@ -0,0 +1,271 @@
+import itertools
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import journal
+from bandwidth import get_scheduler, use_allocation
+from cancel import CancelToken, use_token
+from downloader import download_video, download_audio_multi
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Prioridad en la interfaz -> peso en el reparto del límite de ancho de banda
+PRIORITY_WEIGHTS = {'Baja': 0.5, 'Normal': 1.0, 'Alta': 2.0}
+
+_job_ids = itertools.count(1)
+
+
+class Job:
+    def __init__(self, url: str, quality: str, output_format: str, output_path: str,
+                 title: str = None, info: dict = None, playlist_index: int = None,
+                 journal_id: str = None, weight: float = 1.0):
+        self.id = next(_job_ids)
+        self.journal_id = journal_id or journal.new_job_id()
+        self.url = url
+        self.quality = quality
+        self.output_format = output_format
+        self.output_path = output_path
+        self.title = title or url
+        self.info = info
+        self.playlist_index = playlist_index
+        # Peso en el reparto del límite de ancho de banda frente a los demás trabajos
+        self.weight = weight
+        self.host = (urlsplit(url).hostname or '').lower()
+        self.state = PENDING
+        self.progress = 0.0
+        self.speed = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.target = None
+        self.plan = None
+        self.postprocess_progress = None
+        # Cancelar mata al momento los procesos hijos (ffmpeg) lanzados para este trabajo
+        self.token = CancelToken()
+
+    def cancel(self):
+        self.token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+
+def job_from_journal(entry: dict) -> Job:
+    # Mismo journal_id: el trabajo reanudado continúa la misma entrada del diario
+    return Job(entry['url'], entry['quality'], entry['output_format'], entry['output_path'],
+               title=entry.get('title'), playlist_index=entry.get('playlist_index'),
+               journal_id=entry['job'], weight=entry.get('weight', 1.0))
+
+
+def run_download_job(job: Job, progress_callback, file_callback=None) -> dict:
+    def postprocess_callback(percentage):
+        job.postprocess_progress = percentage
+        # Vuelve a notificar con la descarga ya al 100%
+        progress_callback(100, 0)
+
+    if ',' in job.output_format:
+        # Varios formatos de audio: una descarga y una conversión por formato
+        return download_audio_multi(job.url, job.output_format.split(','), job.quality,
+                                    job.output_path, progress_callback, lambda: job.cancelled,
+                                    info=job.info)
+    return download_video(job.url, job.quality, job.output_format, job.output_path,
+                          progress_callback, lambda: job.cancelled, info=job.info,
+                          file_callback=file_callback,
+                          plan_callback=lambda plan: setattr(job, 'plan', plan),
+                          postprocess_callback=postprocess_callback)
+
+
+class DownloadQueue:
+    def __init__(self, workers: int = 3, per_host: int = 2, on_update=None,
+                 runner=run_download_job, max_pending: int = 0, use_journal: bool = False):
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.on_update = on_update
+        self.runner = runner
+        self.max_pending = max_pending
+        self.use_journal = use_journal
+        self.jobs = {}
+        self._pending = deque()
+        self._host_active = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = []
+        self._spawn_workers()
+
+    # ------------------------------------------------------------------ #
+    #  API
+    # ------------------------------------------------------------------ #
+
+    def submit(self, job: Job, wait: bool = True) -> Job:
+        with self._cond:
+            # Con max_pending > 0 el productor espera (p. ej. al recorrer una playlist)
+            while (wait and self.max_pending and len(self._pending) >= self.max_pending
+                   and not self._stopped):
+                self._cond.wait()
+            self.jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify_all()
+        self._journal(job, journal.QUEUED, url=job.url, quality=job.quality,
+                      output_format=job.output_format, output_path=job.output_path,
+                      title=job.title, playlist_index=job.playlist_index, weight=job.weight)
+        self._notify(job)
+        return job
+
+    def cancel(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.cancel()
+        with self._cond:
+            if job.state == PENDING:
+                try:
+                    self._pending.remove(job)
+                except ValueError:
+                    pass
+                job.state = CANCELLED
+                job.finished_at = time.time()
+                self._cond.notify_all()
+            else:
+                job = None
+        if job is not None:
+            self._journal(job, journal.CANCELLED)
+            self._notify(job)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def remove(self, job_id: int):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is not None and job.finished:
+                del self.jobs[job_id]
+
+    def clear_finished(self):
+        with self._cond:
+            for job_id in [j.id for j in self.jobs.values() if j.finished]:
+                del self.jobs[job_id]
+
+    def active_count(self) -> int:
+        with self._cond:
+            return sum(1 for j in self.jobs.values() if not j.finished)
+
+    def set_limits(self, workers: int, per_host: int):
+        with self._cond:
+            self.workers = max(1, workers)
+            self.per_host = max(1, per_host)
+            # Los workers sobrantes terminan en cuanto quedan libres
+            self._cond.notify_all()
+        self._spawn_workers()
+
+    def shutdown(self, wait: bool = False):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.cancel_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    # ------------------------------------------------------------------ #
+    #  WORKERS
+    # ------------------------------------------------------------------ #
+
+    def _spawn_workers(self):
+        with self._cond:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._worker, args=(index,),
+                                          name=f"download-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _journal(self, job: Job, state: str, **fields):
+        if self.use_journal:
+            try:
+                journal.record(job.journal_id, state, **fields)
+            except OSError:
+                pass
+
+    def _notify(self, job: Job):
+        if self.on_update:
+            try:
+                self.on_update(job)
+            except Exception:
+                pass
+
+    def _next_job(self, index: int):
+        # Primer trabajo pendiente cuyo host no haya alcanzado su límite
+        with self._cond:
+            while not self._stopped and index < self.workers:
+                for job in self._pending:
+                    if self._host_active.get(job.host, 0) < self.per_host:
+                        self._pending.remove(job)
+                        self._host_active[job.host] = self._host_active.get(job.host, 0) + 1
+                        job.state = RUNNING
+                        self._cond.notify_all()
+                        return job
+                self._cond.wait()
+            return None
+
+    def _release(self, job: Job):
+        with self._cond:
+            self._host_active[job.host] -= 1
+            if not self._host_active[job.host]:
+                del self._host_active[job.host]
+            self._cond.notify_all()
+
+    def _worker(self, index: int):
+        while True:
+            job = self._next_job(index)
+            if job is None:
+                return
+            self._journal(job, journal.RUNNING)
+            self._notify(job)
+
+            def progress_callback(percentage, speed, job=job):
+                job.progress = percentage
+                job.speed = speed
+                self._notify(job)
+
+            def file_callback(path, job=job):
+                job.target = path
+                self._journal(job, journal.RUNNING, target=path)
+
+            allocation = get_scheduler().register(job.weight)
+            try:
+                with use_token(job.token), use_allocation(allocation):
+                    job.result = self.runner(job, progress_callback, file_callback)
+                if job.cancelled:
+                    job.state = CANCELLED
+                elif job.result:
+                    job.state = DONE
+                else:
+                    job.state = FAILED
+                    job.error = "No se pudo descargar el vídeo."
+            except Exception as e:
+                job.state = CANCELLED if job.cancelled else FAILED
+                job.error = str(e)
+            finally:
+                get_scheduler().unregister(allocation)
+                job.finished_at = time.time()
+                self._release(job)
+            if job.state == DONE:
+                self._journal(job, journal.DONE, file_path=job.result.get('file_path'))
+            else:
+                self._journal(job, job.state, error=job.error)
+            self._notify(job)
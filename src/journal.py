@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from config import DATA_DIR
+
+JOURNAL_FILE = os.path.join(DATA_DIR, 'jobs.journal')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+UNFINISHED_STATES = (QUEUED, RUNNING)
+
+_lock = threading.Lock()
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def record(job_id: str, state: str, **fields):
+    # Una línea JSON por transición; fsync para que sobreviva a un cierre inesperado
+    line = json.dumps(dict(fields, job=job_id, state=state, ts=time.time()), ensure_ascii=False)
+    with _lock:
+        with open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _replay() -> dict:
+    jobs = {}
+    if not os.path.exists(JOURNAL_FILE):
+        return jobs
+    with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # Última línea a medio escribir tras un cierre brusco
+                continue
+            jobs.setdefault(event['job'], {}).update(event)
+    return jobs
+
+
+def load_unfinished() -> list:
+    with _lock:
+        jobs = _replay()
+    unfinished = [job for job in jobs.values() if job.get('state') in UNFINISHED_STATES]
+    unfinished.sort(key=lambda job: job.get('ts', 0))
+    return unfinished
+
+
+def compact():
+    # Reescribe el diario dejando solo los trabajos sin terminar
+    with _lock:
+        jobs = _replay()
+        tmp_path = JOURNAL_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for job in jobs.values():
+                if job.get('state') in UNFINISHED_STATES:
+                    f.write(json.dumps(job, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, JOURNAL_FILE)
+
+
+def discard(job_ids):
+    for job_id in job_ids:
+        record(job_id, CANCELLED)
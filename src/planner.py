@@ -0,0 +1,202 @@
+# Codecs de origen que se pueden copiar sin recodificar en cada codec de salida (codec_map)
+AUDIO_COPY_SOURCES = {
+    'mp3':    ('mp3',),
+    'aac':    ('aac',),
+    'm4a':    ('aac',),
+    'flac':   ('flac',),
+    # OGG es el contenedor elegido: Opus (webm de YouTube) se remuxa a .ogg sin pérdida
+    'vorbis': ('vorbis', 'opus'),
+    'wav':    (),
+}
+
+# Filtros de yt-dlp para preferir una pista de audio con ese codec
+_ACODEC_FILTERS = {
+    'aac':    '[acodec^=mp4a]',
+    'mp3':    '[acodec=mp3]',
+    'flac':   '[acodec=flac]',
+    'vorbis': '[acodec=vorbis]',
+    'opus':   '[acodec=opus]',
+}
+
+
+def codec_family(acodec: str):
+    # 'mp4a.40.2' -> 'aac'; yt-dlp y ffprobe usan nombres distintos para lo mismo
+    if not acodec or acodec == 'none':
+        return None
+    acodec = acodec.lower()
+    if acodec.startswith('mp4a') or acodec == 'aac':
+        return 'aac'
+    if acodec.startswith('mp3'):
+        return 'mp3'
+    return acodec.split('.')[0]
+
+
+def can_copy(codec: str, source_codec: str) -> bool:
+    return codec_family(source_codec) in AUDIO_COPY_SOURCES.get(codec, ())
+
+
+def _audio_formats(info: dict) -> list:
+    return [f for f in info.get('formats') or []
+            if codec_family(f.get('acodec')) and f.get('vcodec') == 'none']
+
+
+def plan_audio(codec: str, info: dict = None) -> dict:
+    # Con la extracción disponible se predice si habrá copia; sin ella decide el selector
+    sources = AUDIO_COPY_SOURCES.get(codec, ())
+    selector = '/'.join([f'bestaudio{_ACODEC_FILTERS[c]}' for c in sources] + ['bestaudio/best'])
+    plan = {'format': selector, 'copy': None, 'source': None}
+    if info is not None:
+        plan['copy'] = False
+        formats = _audio_formats(info)
+        # Mismo orden de preferencia que el selector
+        for source_codec in sources:
+            candidates = [f for f in formats if codec_family(f.get('acodec')) == source_codec]
+            if candidates:
+                best = max(candidates, key=lambda f: f.get('abr') or f.get('tbr') or 0)
+                plan.update(copy=True, source=best.get('format_id'))
+                break
+    return plan
+
+
+# Codecs que cada contenedor admite por copia (remux); None = cualquiera
+VIDEO_REMUX_CODECS = {
+    'mp4':  ({'h264', 'hevc', 'av1'}, {'aac', 'mp3'}),
+    'mov':  ({'h264', 'hevc'}, {'aac', 'mp3'}),
+    'webm': ({'vp8', 'vp9', 'av1'}, {'opus', 'vorbis'}),
+    'avi':  ({'h264', 'mpeg4'}, {'mp3'}),
+    'mkv':  (None, None),
+}
+
+# Filtros de yt-dlp equivalentes a cada familia de codec
+_VCODEC_PREFIXES = {
+    'h264': ('avc1', 'h264'),
+    'hevc': ('hev1', 'hvc1', 'hevc'),
+    'av1':  ('av01',),
+    'vp9':  ('vp09', 'vp9'),
+    'vp8':  ('vp8',),
+    'mpeg4': ('mp4v',),
+}
+_ACODEC_PREFIXES = {
+    'aac':    ('mp4a', 'aac'),
+    'mp3':    ('mp3',),
+    'opus':   ('opus',),
+    'vorbis': ('vorbis',),
+}
+
+COST_REMUX = 'remux'
+COST_AUDIO = 'audio'
+COST_VIDEO = 'video'
+_COST_RANK = {COST_REMUX: 0, COST_AUDIO: 1, COST_VIDEO: 2}
+
+# Estimaciones aproximadas de CPU por segundo de vídeo (un equipo de 4 núcleos)
+REMUX_SECONDS_PER_SECOND = 0.005
+AUDIO_SECONDS_PER_SECOND = 0.02
+# Recodificar 1080p con libx264 (preset medium) va más o menos a tiempo real
+VIDEO_SECONDS_PER_SECOND_1080P = 1.0
+
+
+def video_family(vcodec: str):
+    if not vcodec or vcodec == 'none':
+        return None
+    vcodec = vcodec.lower()
+    for family, prefixes in _VCODEC_PREFIXES.items():
+        if vcodec.startswith(prefixes):
+            return family
+    return vcodec.split('.')[0]
+
+
+def stream_plan(container: str, vcodec: str, acodec: str) -> dict:
+    # Qué streams se copian y cuáles hay que recodificar para llegar al contenedor
+    video_ok, audio_ok = VIDEO_REMUX_CODECS.get(container, (None, None))
+    vfam, afam = video_family(vcodec), codec_family(acodec)
+    copy_video = vfam is None or video_ok is None or vfam in video_ok
+    copy_audio = afam is None or audio_ok is None or afam in audio_ok
+    if not copy_video:
+        cost = COST_VIDEO
+    elif not copy_audio:
+        cost = COST_AUDIO
+    else:
+        cost = COST_REMUX
+    return {'copy_video': copy_video, 'copy_audio': copy_audio, 'cost': cost}
+
+
+def estimate_seconds(cost: str, duration, height) -> float:
+    if not duration:
+        return None
+    if cost == COST_VIDEO:
+        scale = ((height or 1080) / 1080) ** 2
+        return round(duration * VIDEO_SECONDS_PER_SECOND_1080P * scale, 1)
+    if cost == COST_AUDIO:
+        return round(duration * AUDIO_SECONDS_PER_SECOND, 1)
+    return round(duration * REMUX_SECONDS_PER_SECOND, 1)
+
+
+def _regex_filter(field: str, prefixes) -> str:
+    return f"[{field}~='^({'|'.join(prefixes)})']"
+
+
+def video_selector(container: str, height_filter: str = '') -> str:
+    # Primero parejas que se remuxan, luego solo audio a convertir y al final cualquiera
+    video_ok, audio_ok = VIDEO_REMUX_CODECS.get(container, (None, None))
+    hf = height_filter
+    if video_ok is None:
+        return f'bestvideo{hf}+bestaudio/best{hf}/best'
+    vfilter = _regex_filter('vcodec', [p for c in sorted(video_ok) for p in _VCODEC_PREFIXES[c]])
+    afilter = _regex_filter('acodec', [p for c in sorted(audio_ok) for p in _ACODEC_PREFIXES[c]])
+    return '/'.join([
+        f'bestvideo{hf}{vfilter}+bestaudio{afilter}',
+        f'best{hf}{vfilter}{afilter}',
+        f'bestvideo{hf}{vfilter}+bestaudio',
+        f'bestvideo{hf}+bestaudio',
+        f'best{hf}',
+        'best',
+    ])
+
+
+def _quality_key(f: dict):
+    return (f.get('height') or 0, f.get('fps') or 0, f.get('vbr') or f.get('tbr') or 0)
+
+
+def plan_video(container: str, max_height: int = None, info: dict = None) -> dict:
+    hf = f'[height<={max_height}]' if max_height else ''
+    selector = video_selector(container, hf)
+    plan = {'format': selector, 'cost': None, 'estimated_seconds': None}
+    if info is None or not info.get('formats'):
+        return plan
+
+    formats = info['formats']
+    videos = [f for f in formats if video_family(f.get('vcodec')) and f.get('acodec') == 'none']
+    audios = [f for f in formats if codec_family(f.get('acodec')) and f.get('vcodec') == 'none']
+    muxed = [f for f in formats if video_family(f.get('vcodec')) and codec_family(f.get('acodec'))]
+    if max_height:
+        capped = [f for f in videos + muxed if (f.get('height') or 0) <= max_height]
+        # Si nada cumple el límite se usa lo que haya, como hace el selector
+        if capped:
+            videos = [f for f in videos if f in capped]
+            muxed = [f for f in muxed if f in capped]
+
+    candidates = []
+    for video in videos:
+        for audio in audios:
+            streams = stream_plan(container, video.get('vcodec'), audio.get('acodec'))
+            key = (-_COST_RANK[streams['cost']], _quality_key(video),
+                   audio.get('abr') or audio.get('tbr') or 0)
+            candidates.append((key, f"{video['format_id']}+{audio['format_id']}", video, streams))
+    for f in muxed:
+        streams = stream_plan(container, f.get('vcodec'), f.get('acodec'))
+        candidates.append(((-_COST_RANK[streams['cost']], _quality_key(f), 0),
+                           f['format_id'], f, streams))
+    if not candidates:
+        return plan
+
+    _, format_id, video, streams = max(candidates, key=lambda c: c[0])
+    plan.update(streams)
+    plan.update(
+        format=f'{format_id}/{selector}',
+        format_id=format_id,
+        height=video.get('height'),
+        vcodec=video.get('vcodec'),
+        estimated_seconds=estimate_seconds(streams['cost'], info.get('duration'),
+                                           video.get('height')),
+    )
+    return plan
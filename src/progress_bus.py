@@ -0,0 +1,91 @@
+import math
+import threading
+import time
+
+from job_queue import RUNNING
+
+# Refrescos por segundo de la interfaz, sea cual sea el número de trabajos
+DEFAULT_FPS = 10
+# Constante de tiempo (s) de las medias exponenciales de velocidad y avance
+SPEED_TAU = 3.0
+
+
+class JobStats:
+    # Velocidad y ETA suavizadas: media exponencial ajustada al tiempo real entre muestras
+    def __init__(self):
+        self.speed = None
+        self.rate = None
+        self._last_time = None
+        self._last_progress = None
+
+    def update(self, progress: float, speed: float, now: float):
+        if self._last_time is None or progress < self._last_progress:
+            # Primera muestra o progreso reiniciado (p. ej. segundo stream de la mezcla)
+            self._last_time, self._last_progress = now, progress
+            if speed:
+                self.speed = speed
+            self.rate = None
+            return
+        dt = now - self._last_time
+        if dt <= 0:
+            return
+        alpha = 1 - math.exp(-dt / SPEED_TAU)
+        if speed:
+            self.speed = speed if self.speed is None else self.speed + alpha * (speed - self.speed)
+        rate = (progress - self._last_progress) / dt
+        self.rate = rate if self.rate is None else self.rate + alpha * (rate - self.rate)
+        self._last_time, self._last_progress = now, progress
+
+    def eta(self, progress: float):
+        # Segundos hasta el 100% al ritmo medio de avance (en % por segundo)
+        if not self.rate or self.rate <= 0 or progress >= 100:
+            return None
+        return (100 - progress) / self.rate
+
+
+class ProgressBus:
+    # Junta las actualizaciones de cada trabajo y entrega solo la última, como mucho fps veces
+    # por segundo: la cola de eventos de Tk no crece con la velocidad de los hooks de yt-dlp.
+    # schedule(ms, fn) programa fn en el hilo de la interfaz (Tk.after); deliver(job, stats)
+    # se llama siempre desde ese hilo
+    def __init__(self, schedule, deliver, fps: int = DEFAULT_FPS):
+        self.schedule = schedule
+        self.deliver = deliver
+        self.interval_ms = max(1, int(1000 / fps))
+        self._pending = {}
+        self._stats = {}
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def publish(self, job):
+        # Desde cualquier hilo
+        with self._lock:
+            stats = self._stats.get(job.id)
+            if stats is None:
+                stats = self._stats[job.id] = JobStats()
+            if job.state == RUNNING and job.progress < 100:
+                stats.update(job.progress, job.speed, time.time())
+            self._pending[job.id] = job
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.schedule(self.interval_ms, self._flush)
+
+    def stats(self, job_id: int):
+        with self._lock:
+            return self._stats.get(job_id)
+
+    def forget(self, job_id: int):
+        with self._lock:
+            self._stats.pop(job_id, None)
+            self._pending.pop(job_id, None)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+            stats = {job_id: self._stats.get(job_id) for job_id in pending}
+        for job_id, job in pending.items():
+            self.deliver(job, stats[job_id])
+            if job.finished:
+                self.forget(job_id)
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+import yt_dlp
+from requests.adapters import HTTPAdapter
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.utils import determine_protocol
+from yt_dlp.utils.networking import HTTPHeaderDict, clean_proxies
+
+from bandwidth import current_allocation
+from cancel import DownloadCancelled, current_token
+
+# Por debajo de este tamaño por conexión no compensa partir el archivo
+MIN_RANGE_SIZE = 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 0.25
+# Cada cuánto se guarda el estado de los tramos para poder reanudar
+STATE_INTERVAL = 1.0
+REQUEST_TIMEOUT = 20
+
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)')
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def make_session(connections: int, retries: int = 0) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, connections),
+                          max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def ydl_session(ydl, connections: int, headers: dict = None):
+    # Sesión con las cookies, el proxy y los reintentos que usaría yt-dlp. Devuelve también
+    # las cabeceras sin Ytdl-Request-Proxy (el proxy por petición de algunos extractores)
+    headers = HTTPHeaderDict(headers or {})
+    proxies = dict(ydl.proxies)
+    clean_proxies(proxies, headers)
+    session = make_session(connections, ydl.params.get('retries', 10))
+    # yt-dlp ya ha leído las variables de entorno; None es "sin proxy" para ese esquema
+    session.trust_env = False
+    session.proxies = {key: url for key, url in proxies.items() if url and key != 'no'}
+    for cookie in ydl.cookiejar:
+        session.cookies.set_cookie(cookie)
+    return session, dict(headers)
+
+
+def probe(session: requests.Session, url: str, headers: dict = None):
+    # Pide el primer byte: un 206 con Content-Range indica que el servidor respeta Range
+    request_headers = dict(headers or {}, Range='bytes=0-0')
+    with session.get(url, headers=request_headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        match = _CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+        if response.status_code == 206 and match:
+            return int(match.group(3)), True
+        length = response.headers.get('Content-Length')
+        return (int(length) if length and length.isdigit() else None), False
+
+
+def split_ranges(size: int, parts: int) -> list:
+    parts = max(1, min(parts, size // MIN_RANGE_SIZE or 1))
+    step = size // parts
+    ranges = []
+    for i in range(parts):
+        start = i * step
+        end = size - 1 if i == parts - 1 else start + step - 1
+        ranges.append((start, end))
+    return ranges
+
+
+class RangeDownloader:
+    def __init__(self, url: str, path: str, connections: int = 4, headers: dict = None,
+                 session: requests.Session = None, progress_callback=None,
+                 chunk_size: int = None):
+        self.url = url
+        self.path = path
+        self.connections = max(1, connections)
+        self.headers = dict(headers or {})
+        self.session = session or make_session(self.connections)
+        # Tamaño máximo de cada petición (http_chunk_size de yt-dlp; YouTube limita las grandes)
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        # Los hilos de lectura no heredan el trabajo: su parte del límite se toma aquí
+        self.allocation = current_allocation()
+        self.state_path = path + '.ranges'
+        self.downloaded = 0
+        self.total = None
+        self._done = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._errors = []
+
+    def download(self, single: bool = True) -> dict:
+        # single=False: si no se puede partir, RangeNotSupported en vez de un solo stream
+        start = time.time()
+        size, ranged = probe(self.session, self.url, self.headers)
+        self.total = size
+        ranges = split_ranges(size, self.connections) if ranged and size else []
+        if len(ranges) <= 1 and not single:
+            raise RangeNotSupported("El archivo no se puede partir en rangos")
+        if len(ranges) > 1:
+            try:
+                self._download_ranges(ranges)
+            except RangeNotSupported:
+                # El servidor dejó de respetar Range a mitad: se repite en un solo stream
+                ranges = []
+                self.downloaded = 0
+        if len(ranges) <= 1:
+            self._download_single()
+        return {
+            'bytes': self.downloaded,
+            'connections': len(ranges) or 1,
+            'ranged': len(ranges) > 1,
+            'elapsed': round(time.time() - start, 3),
+        }
+
+    def _report(self):
+        if self.progress_callback:
+            self.progress_callback(self.downloaded, self.total)
+
+    def _add(self, count: int, range_start: int = None):
+        with self._lock:
+            self.downloaded += count
+            if range_start is not None:
+                self._done[range_start] = self._done.get(range_start, 0) + count
+
+    def _load_state(self, ranges: list) -> bool:
+        # Reanuda si hay un .part del mismo tamaño con el estado de sus tramos
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('total') != self.total or state.get('ranges') != [list(r) for r in ranges]
+                    or os.path.getsize(self.path) != self.total):
+                return False
+        except (OSError, ValueError):
+            return False
+        self._done = {int(start): done for start, done in state.get('done', {}).items()}
+        self.downloaded = sum(self._done.values())
+        return True
+
+    def _save_state(self, ranges: list):
+        with self._lock:
+            state = {'total': self.total, 'ranges': [list(r) for r in ranges],
+                     'done': {str(start): done for start, done in self._done.items()}}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _clear_state(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def _download_single(self):
+        with self.session.get(self.url, headers=self.headers, stream=True,
+                              timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            last_report = 0
+            with open(self.path, 'wb') as f:
+                for chunk in response.iter_content(BLOCK_SIZE):
+                    f.write(chunk)
+                    self._add(len(chunk))
+                    if self.allocation:
+                        self.allocation.consume(len(chunk))
+                    now = time.time()
+                    if now - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        self._report()
+        self._report()
+
+    def _download_ranges(self, ranges: list):
+        if not self._load_state(ranges):
+            # Archivo preasignado: cada conexión escribe su tramo en su posición
+            self._done = {}
+            self.downloaded = 0
+            with open(self.path, 'wb') as f:
+                f.truncate(self.total)
+        threads = [threading.Thread(target=self._fetch_range, args=r, daemon=True) for r in ranges]
+        for thread in threads:
+            thread.start()
+        last_save = time.time()
+        try:
+            # Los callbacks se llaman desde este hilo para que sus excepciones (cancelar) se propaguen
+            while any(t.is_alive() for t in threads):
+                for thread in threads:
+                    thread.join(PROGRESS_INTERVAL / len(threads))
+                if self._errors:
+                    break
+                if time.time() - last_save >= STATE_INTERVAL:
+                    last_save = time.time()
+                    self._save_state(ranges)
+                self._report()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self._save_state(ranges)
+        if self._errors:
+            if isinstance(self._errors[0], RangeNotSupported):
+                self._clear_state()
+            raise self._errors[0]
+        self._clear_state()
+        self._report()
+
+    def _fetch_range(self, start: int, end: int):
+        offset = start + self._done.get(start, 0)
+        try:
+            # Sin búfer: lo contado en el estado ya está escrito en el archivo
+            with open(self.path, 'r+b', buffering=0) as f:
+                while offset <= end and not self._stop.is_set():
+                    last = min(end, offset + self.chunk_size - 1) if self.chunk_size else end
+                    headers = dict(self.headers, Range=f'bytes={offset}-{last}')
+                    received = 0
+                    with self.session.get(self.url, headers=headers, stream=True,
+                                          timeout=REQUEST_TIMEOUT) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise RangeNotSupported(f"El servidor ignoró Range {offset}-{last}")
+                        f.seek(offset)
+                        for chunk in response.iter_content(BLOCK_SIZE):
+                            if self._stop.is_set():
+                                return
+                            f.write(chunk)
+                            received += len(chunk)
+                            self._add(len(chunk), start)
+                            if self.allocation:
+                                self.allocation.consume(len(chunk), self._stop.is_set)
+                    if not received:
+                        raise OSError(f"Respuesta vacía para el rango {offset}-{last}")
+                    offset += received
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+
+class RangeSplitFD(FileDownloader):
+    def real_download(self, filename, info_dict):
+        tmpfilename = self.temp_name(filename)
+        self.report_destination(filename)
+        start = time.time()
+
+        def progress(downloaded, total):
+            elapsed = time.time() - start
+            speed = downloaded / elapsed if elapsed > 0 else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'tmpfilename': tmpfilename,
+                'throttled': True,
+                'filename': filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and total else None,
+            }, info_dict)
+
+        connections = self.params.get('range_split_connections', 1)
+        session, headers = ydl_session(self.ydl, connections, info_dict.get('http_headers'))
+        downloader = RangeDownloader(
+            info_dict['url'], tmpfilename, connections=connections, headers=headers,
+            session=session, progress_callback=progress,
+            chunk_size=(info_dict.get('downloader_options') or {}).get('http_chunk_size'))
+        try:
+            stats = downloader.download(single=False)
+        except Exception:
+            # Lo que quede lo descargaría yt-dlp de cero: un .part preasignado del tamaño total
+            # le parecería ya completo
+            token = current_token()
+            if token is None or not token.cancelled:
+                for path in (tmpfilename, downloader.state_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            raise
+        self.try_rename(tmpfilename, filename)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': stats['bytes'],
+            'total_bytes': stats['bytes'],
+            'filename': filename,
+            'elapsed': time.time() - start,
+        }, info_dict)
+        return True
+
+
+class RangeSplitYoutubeDL(yt_dlp.YoutubeDL):
+    # Usa RangeSplitFD para formatos progresivos (un solo archivo HTTP) si está activado; si
+    # falla (sin soporte de Range, 403, timeout...) sigue con el descargador HTTP de yt-dlp
+    def dl(self, name, info, subtitle=False, test=False):
+        if (not test and not subtitle and name != '-'
+                and self.params.get('range_split_connections', 1) > 1
+                and info.get('url') and not info.get('fragments')
+                and determine_protocol(info) in ('http', 'https')):
+            fd = RangeSplitFD(self, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            try:
+                return fd.download(name, new_info, subtitle)
+            except yt_dlp.utils.DownloadCancelled:
+                raise
+            except Exception as e:
+                token = current_token()
+                if token is not None and token.cancelled:
+                    raise DownloadCancelled() from e
+                if not isinstance(e, RangeNotSupported):
+                    self.report_warning(f"Descarga por rangos no disponible ({e}); "
+                                        "se descarga con una conexión")
+        return super().dl(name, info, subtitle=subtitle, test=test)
@@ -0,0 +1,189 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+from cancel import DownloadCancelled, current_token
+
+# Por debajo de esta duración no compensa trocear el archivo
+MIN_PARALLEL_DURATION = 60
+MIN_SEGMENT_SECONDS = 15
+# Más tramos que workers para que ninguno se quede esperando al más lento
+SEGMENTS_PER_WORKER = 2
+POLL_INTERVAL = 0.25
+
+_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+
+def keyframe_times(ffprobe: str, path: str) -> list:
+    # Lee solo los paquetes (sin decodificar) y se queda con los marcados como clave
+    cmd = [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path]
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True,
+                            creationflags=_NO_WINDOW).stdout
+    times = []
+    for line in output.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                continue
+    return sorted(set(times))
+
+
+def split_points(keyframes: list, duration: float, segments: int) -> list:
+    # Tramos [inicio, fin) que empiezan en fotogramas clave, lo más parecidos posible
+    segments = max(1, min(segments, int(duration // MIN_SEGMENT_SECONDS) or 1))
+    step = duration / segments
+    cuts = [0.0]
+    for i in range(1, segments):
+        target = i * step
+        candidates = [t for t in keyframes if cuts[-1] + MIN_SEGMENT_SECONDS <= t
+                      <= duration - MIN_SEGMENT_SECONDS]
+        if not candidates:
+            break
+        cut = min(candidates, key=lambda t: abs(t - target))
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    bounds = cuts + [duration]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(cuts))]
+
+
+class SegmentEncoder:
+    def __init__(self, source: str, target: str, video_args: list, audio_args: list = None,
+                 duration: float = None, workers: int = None, ffmpeg: str = 'ffmpeg',
+                 ffprobe: str = 'ffprobe', progress_callback=None, cancel_check=None):
+        self.source = source
+        self.target = target
+        self.video_args = video_args
+        self.audio_args = audio_args
+        self.duration = duration
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.progress_callback = progress_callback
+        self.cancel_check = cancel_check
+        self._procs = set()
+        self._done = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        # Los ffmpeg corren en hilos del pool: el token del trabajo se toma aquí
+        self._token = current_token()
+
+    def run(self) -> dict:
+        start = time.time()
+        ranges = split_points(keyframe_times(self.ffprobe, self.source), self.duration,
+                              self.workers * SEGMENTS_PER_WORKER)
+        # Los hilos de cada ffmpeg se reparten para no sobresuscribir los núcleos
+        threads = max(1, (os.cpu_count() or 1) // min(self.workers, len(ranges)))
+        workdir = tempfile.mkdtemp(prefix='.segments-', dir=os.path.dirname(self.target) or '.')
+        try:
+            segment_paths = [os.path.join(workdir, f'seg_{i:04d}.mkv') for i in range(len(ranges))]
+            audio_path = os.path.join(workdir, 'audio.mka') if self.audio_args is not None else None
+            with ThreadPoolExecutor(max_workers=self.workers + 1) as pool:
+                futures = [pool.submit(self._encode_segment, i, seg_start, seg_end, path, threads,
+                                       i == len(ranges) - 1)
+                           for i, ((seg_start, seg_end), path) in enumerate(zip(ranges, segment_paths))]
+                if audio_path:
+                    futures.append(pool.submit(self._run, [
+                        '-i', self.source, '-vn'] + self.audio_args + [audio_path]))
+                try:
+                    self._wait(futures)
+                except BaseException:
+                    self.cancel()
+                    raise
+            self._concat(segment_paths, audio_path, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        return {
+            'segments': len(ranges),
+            'workers': min(self.workers, len(ranges)),
+            'threads_per_worker': threads,
+            'elapsed': round(time.time() - start, 1),
+        }
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            procs = list(self._procs)
+        # kill y no terminate: con SIGTERM ffmpeg vacía el encoder antes de salir
+        for proc in procs:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    def _wait(self, futures: list):
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+            for future in done:
+                future.result()
+            if self.cancel_check and self.cancel_check():
+                raise DownloadCancelled()
+            self._report()
+
+    def _report(self):
+        if self.progress_callback and self.duration:
+            with self._lock:
+                encoded = sum(self._done.values())
+            self.progress_callback(min(100.0, encoded / self.duration * 100))
+
+    def _encode_segment(self, index: int, start: float, end: float, path: str, threads: int,
+                        last: bool = False):
+        # -ss y -t como opciones de entrada: corte exacto sin perder el último fotograma del tramo.
+        # El último va hasta el final del archivo: la duración de yt-dlp viene redondeada
+        args = ['-ss', f'{start:.6f}']
+        if not last:
+            args += ['-t', f'{end - start:.6f}']
+        args += ['-i', self.source, '-map', '0:v:0', '-an', '-sn'] + self.video_args + [
+            '-threads', str(threads), path]
+
+        def on_time(seconds):
+            with self._lock:
+                self._done[index] = min(seconds, end - start)
+
+        self._run(args, on_time)
+        on_time(end - start)
+
+    def _concat(self, segment_paths: list, audio_path: str, workdir: str):
+        # Concatenación sin pérdida (demuxer concat) y mezcla con el audio en el contenedor final
+        list_path = os.path.join(workdir, 'segments.txt')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                escaped = path.replace("'", r"'\''")
+                f.write(f"file '{escaped}'\n")
+        args = ['-f', 'concat', '-safe', '0', '-i', list_path]
+        if audio_path:
+            args += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+        self._run(args + ['-c', 'copy', self.target])
+
+    def _run(self, args: list, on_time=None):
+        if self._cancelled.is_set():
+            raise DownloadCancelled()
+        cmd = [self.ffmpeg, '-y', '-nostdin', '-hide_banner', '-loglevel', 'error',
+               '-progress', 'pipe:1'] + args
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                creationflags=_NO_WINDOW)
+        with self._lock:
+            self._procs.add(proc)
+        if self._token is not None:
+            self._token.track(proc)
+        try:
+            for line in proc.stdout:
+                key, _, value = line.strip().partition('=')
+                if on_time and key in ('out_time_us', 'out_time_ms') and value.isdigit():
+                    on_time(int(value) / 1e6)
+            stderr = proc.stderr.read()
+            returncode = proc.wait()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        if self._cancelled.is_set() or (self._token is not None and self._token.cancelled):
+            raise DownloadCancelled()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg falló: {stderr.strip() or returncode}")
@@ -0,0 +1,213 @@
+import os
+import subprocess
+import threading
+import time
+
+import requests
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import determine_protocol
+
+from bandwidth import current_allocation
+from cancel import DownloadCancelled, current_token, track
+from range_download import (RangeSplitYoutubeDL, make_session, ydl_session, BLOCK_SIZE,
+                            PROGRESS_INTERVAL, REQUEST_TIMEOUT)
+
+
+class StreamMergeError(Exception):
+    pass
+
+
+def can_stream_merge(info: dict, params: dict) -> bool:
+    # Solo POSIX (pass_fds) y dos formatos HTTP de un solo archivo (vídeo + audio)
+    formats = info.get('requested_formats') or []
+    return (os.name == 'posix' and params.get('stream_merge')
+            and not params.get('simulate') and not params.get('skip_download')
+            and len(formats) == 2
+            and sum(f.get('vcodec') not in (None, 'none') for f in formats) == 1
+            and all(f.get('url') and not f.get('fragments')
+                    and determine_protocol(f) in ('http', 'https') for f in formats))
+
+
+class StreamMerger:
+    # Descarga vídeo y audio a dos pipes que ffmpeg mezcla directamente en el archivo final
+    def __init__(self, formats: list, target: str, ffmpeg: str = 'ffmpeg',
+                 session: requests.Session = None, progress_callback=None):
+        # Primero el vídeo: -map 0:v / 1:a
+        self.formats = sorted(formats, key=lambda f: f.get('vcodec') in (None, 'none'))
+        self.target = target
+        base, ext = os.path.splitext(target)
+        self.temp_path = f'{base}.temp{ext}'
+        self.ffmpeg = ffmpeg
+        self.session = session or make_session(len(formats))
+        self.progress_callback = progress_callback
+        self.allocation = current_allocation()
+        self.downloaded = [0] * len(self.formats)
+        self.totals = [f.get('filesize') or f.get('filesize_approx') for f in self.formats]
+        self._errors = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return sum(self.totals) if all(self.totals) else None
+
+    def run(self) -> dict:
+        start = time.time()
+        pipes = [os.pipe() for _ in self.formats]
+        read_fds = [r for r, _ in pipes]
+        # -xerror: sin él, un error de lectura en una entrada (p. ej. un m4a con el moov al
+        # final, que no se puede leer de un pipe) deja un archivo sin esa pista y código 0
+        cmd = [self.ffmpeg, '-y', '-nostdin', '-hide_banner', '-loglevel', 'error', '-xerror']
+        for fd in read_fds:
+            cmd += ['-i', f'pipe:{fd}']
+        cmd += ['-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', self.temp_path]
+        try:
+            proc = subprocess.Popen(cmd, pass_fds=read_fds, stdin=subprocess.DEVNULL,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            for r, w in pipes:
+                os.close(r)
+                os.close(w)
+            raise StreamMergeError(f"No se pudo iniciar ffmpeg: {e}")
+        track(proc)
+        # Los extremos de lectura ya los tiene ffmpeg
+        for fd in read_fds:
+            os.close(fd)
+
+        stderr = []
+        stderr_thread = threading.Thread(target=lambda: stderr.append(proc.stderr.read()),
+                                         daemon=True)
+        stderr_thread.start()
+        feeders = [threading.Thread(target=self._feed, args=(i, f, w), daemon=True)
+                   for i, (f, (_, w)) in enumerate(zip(self.formats, pipes))]
+        for thread in feeders:
+            thread.start()
+        try:
+            # Los callbacks se llaman desde este hilo para que sus excepciones (cancelar) se propaguen
+            while any(t.is_alive() for t in feeders):
+                for thread in feeders:
+                    thread.join(PROGRESS_INTERVAL / len(feeders))
+                if self._errors:
+                    break
+                self._report()
+            if self._errors:
+                raise self._errors[0]
+            returncode = proc.wait()
+            stderr_thread.join()
+            if returncode != 0:
+                message = b''.join(stderr).decode('utf-8', 'replace').strip()
+                raise StreamMergeError(f"ffmpeg falló al mezclar: {message or returncode}")
+        except BaseException:
+            self._stop.set()
+            proc.kill()
+            for thread in feeders:
+                thread.join()
+            proc.wait()
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+            raise
+        os.replace(self.temp_path, self.target)
+        self._report()
+        return {'bytes': sum(self.downloaded), 'elapsed': round(time.time() - start, 3)}
+
+    def _report(self):
+        if self.progress_callback:
+            self.progress_callback(sum(self.downloaded), self.total)
+
+    def _feed(self, index: int, fmt: dict, fd: int):
+        headers = dict(fmt.get('http_headers') or {})
+        # Mismo troceado que yt-dlp (YouTube limita las peticiones de archivo completo)
+        chunk_size = (fmt.get('downloader_options') or {}).get('http_chunk_size')
+        offset = 0
+        try:
+            with os.fdopen(fd, 'wb') as pipe:
+                while not self._stop.is_set():
+                    request_headers = dict(headers)
+                    if chunk_size:
+                        request_headers['Range'] = f'bytes={offset}-{offset + chunk_size - 1}'
+                    with self.session.get(fmt['url'], headers=request_headers, stream=True,
+                                          timeout=REQUEST_TIMEOUT) as response:
+                        response.raise_for_status()
+                        partial = response.status_code == 206
+                        if not self.totals[index]:
+                            length = response.headers.get('Content-Range', '').rpartition('/')[2]
+                            if not partial:
+                                length = response.headers.get('Content-Length', '')
+                            if length.isdigit():
+                                self.totals[index] = int(length)
+                        for chunk in response.iter_content(BLOCK_SIZE):
+                            if self._stop.is_set():
+                                return
+                            pipe.write(chunk)
+                            offset += len(chunk)
+                            if self.allocation:
+                                self.allocation.consume(len(chunk), self._stop.is_set)
+                            with self._lock:
+                                self.downloaded[index] = offset
+                    if not chunk_size or not partial or offset >= (self.totals[index] or 0):
+                        return
+        except BrokenPipeError:
+            if not self._stop.is_set():
+                self._errors.append(StreamMergeError("ffmpeg cerró la entrada antes de tiempo"))
+                self._stop.set()
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+
+class StreamingYoutubeDL(RangeSplitYoutubeDL):
+    # Con stream_merge, mezcla vídeo y audio mientras se descargan; yt-dlp encuentra después
+    # el archivo final ya hecho, se salta descarga y mezcla y sigue con el postproceso
+    def process_info(self, info_dict):
+        if can_stream_merge(info_dict, self.params):
+            filename = self.prepare_filename(info_dict)
+            ffmpeg = FFmpegPostProcessor(self)
+            if ffmpeg.available and not os.path.exists(filename):
+                try:
+                    self._stream_merge(info_dict, filename, ffmpeg.executable)
+                except (StreamMergeError, requests.RequestException, OSError) as e:
+                    # ffmpeg muerto por la cancelación: no se intenta la descarga normal
+                    token = current_token()
+                    if token is not None and token.cancelled:
+                        raise DownloadCancelled() from e
+                    self.report_warning(f"Mezcla en streaming no disponible ({e}); "
+                                        "se descarga por separado")
+        return super().process_info(info_dict)
+
+    def _stream_merge(self, info_dict: dict, filename: str, ffmpeg: str):
+        start = time.time()
+
+        def progress(downloaded, total):
+            elapsed = time.time() - start
+            speed = downloaded / elapsed if elapsed > 0 else None
+            self._stream_hook({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'filename': filename,
+                'tmpfilename': merger.temp_path,
+                'throttled': True,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and total else None,
+            }, info_dict)
+
+        session, _ = ydl_session(self, len(info_dict['requested_formats']))
+        merger = StreamMerger(info_dict['requested_formats'], filename, ffmpeg,
+                              session=session, progress_callback=progress)
+        self.to_screen(f"[stream-merge] Mezclando mientras se descarga: {filename}")
+        stats = merger.run()
+        self._stream_hook({
+            'status': 'finished',
+            'downloaded_bytes': stats['bytes'],
+            'total_bytes': stats['bytes'],
+            'filename': filename,
+            'elapsed': stats['elapsed'],
+        }, info_dict)
+
+    def _stream_hook(self, status: dict, info_dict: dict):
+        status['info_dict'] = info_dict
+        for hook in self._progress_hooks:
+            hook(status)
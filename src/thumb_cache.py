@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from config import DATA_DIR, load_config
+
+THUMB_CACHE_DIR = os.path.join(DATA_DIR, 'thumbnails')
+INDEX_NAME = 'index.jsonl'
+
+# Píxeles decodificados que se guardan en memoria (RGB: ancho x alto x 3 bytes)
+MEMORY_BUDGET = 16 * 1024 * 1024
+# El índice se reescribe cuando tiene este múltiplo de líneas respecto a sus entradas vivas
+COMPACT_RATIO = 2
+
+
+def cache_key(url: str, width: int, height: int) -> str:
+    return f"{url}|{width}x{height}"
+
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailCache:
+    # Miniaturas ya recortadas y escaladas a cada tamaño de destino. En disco se guardan por el
+    # hash del original (dos URLs de la misma imagen comparten archivo) y el índice
+    # URL+tamaño -> archivo es un jsonl al que solo se añaden líneas. La antigüedad para el LRU
+    # del disco es el mtime de cada archivo, que se actualiza en cada acierto
+    def __init__(self, directory: str, disk_budget: int, memory_budget: int = MEMORY_BUDGET):
+        self.directory = directory
+        self.disk_budget = max(0, disk_budget)
+        self.memory_budget = max(0, memory_budget)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = {}
+        self._keys = {}
+        self._blobs = OrderedDict()
+        self._disk_bytes = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._index_lines = 0
+        self._load()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_NAME)
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        blobs = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.png'):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                blobs.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(blobs):
+            self._blobs[name] = size
+            self._disk_bytes += size
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._index_lines += 1
+                    if entry.get('blob') in self._blobs:
+                        self._link(entry['key'], entry['blob'])
+                    else:
+                        self._unlink(entry.get('key'))
+        with self._lock:
+            self._evict()
+            if self._index_lines > COMPACT_RATIO * len(self._index):
+                self._compact()
+
+    def _link(self, key: str, blob: str):
+        self._unlink(key)
+        self._index[key] = blob
+        self._keys.setdefault(blob, set()).add(key)
+
+    def _unlink(self, key: str):
+        blob = self._index.pop(key, None)
+        if blob is not None:
+            self._keys.get(blob, set()).discard(key)
+
+    def _append(self, entries: list):
+        try:
+            with open(self._index_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index_lines += len(entries)
+        except OSError:
+            pass
+
+    def _compact(self):
+        tmp_path = self._index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, blob in self._index.items():
+                    f.write(json.dumps({'key': key, 'blob': blob}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self._index_path)
+            self._index_lines = len(self._index)
+        except OSError:
+            pass
+
+    def _remember(self, key: str, img: Image.Image):
+        if key in self._memory:
+            self._memory_bytes -= _image_bytes(self._memory.pop(key))
+        self._memory[key] = img
+        self._memory_bytes += _image_bytes(img)
+        while self._memory_bytes > self.memory_budget and self._memory:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= _image_bytes(old)
+
+    def _drop_blob(self, blob: str):
+        size = self._blobs.pop(blob, None)
+        if size is None:
+            return
+        self._disk_bytes -= size
+        keys = self._keys.pop(blob, set())
+        for key in keys:
+            self._index.pop(key, None)
+        self._append([{'key': key, 'blob': None} for key in keys])
+        try:
+            os.remove(os.path.join(self.directory, blob))
+        except OSError:
+            pass
+
+    def _evict(self):
+        # Las menos usadas primero; la más reciente se queda aunque sola pase del presupuesto
+        while self._disk_bytes > self.disk_budget and len(self._blobs) > 1:
+            self._drop_blob(next(iter(self._blobs)))
+            self.evictions += 1
+
+    def get_memory(self, url: str, width: int, height: int):
+        # Solo la capa de memoria: se puede consultar desde el hilo de la interfaz
+        key = cache_key(url, width, height)
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return img
+
+    def contains(self, url: str, width: int, height: int) -> bool:
+        key = cache_key(url, width, height)
+        with self._lock:
+            return key in self._memory or key in self._index
+
+    def get(self, url: str, width: int, height: int):
+        key = cache_key(url, width, height)
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return img
+            blob = self._index.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+        path = os.path.join(self.directory, blob)
+        try:
+            with Image.open(path) as f:
+                img = f.convert("RGB")
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._drop_blob(blob)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            if blob in self._blobs:
+                self._blobs.move_to_end(blob)
+            self._remember(key, img)
+        return img
+
+    def put(self, url: str, width: int, height: int, source: bytes, img: Image.Image):
+        # source: los bytes descargados, que dan el nombre del archivo
+        key = cache_key(url, width, height)
+        blob = f"{hashlib.sha256(source).hexdigest()}_{width}x{height}.png"
+        path = os.path.join(self.directory, blob)
+        size = None
+        while True:
+            with self._lock:
+                if blob in self._blobs or size is not None:
+                    if blob in self._blobs:
+                        self._blobs.move_to_end(blob)
+                    else:
+                        self._blobs[blob] = size
+                        self._disk_bytes += size
+                    if self._index.get(key) != blob:
+                        self._link(key, blob)
+                        self._append([{'key': key, 'blob': blob}])
+                    self._remember(key, img)
+                    self._evict()
+                    return
+            # No está en disco, o se ha expulsado desde la última comprobación: se escribe
+            # fuera del bloqueo y se registra en la siguiente vuelta
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                img.save(tmp_path, format='PNG')
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except OSError:
+                with self._lock:
+                    self._remember(key, img)
+                return
+
+    def clear(self):
+        with self._lock:
+            for blob in list(self._blobs):
+                try:
+                    os.remove(os.path.join(self.directory, blob))
+                except OSError:
+                    pass
+            self._blobs.clear()
+            self._index.clear()
+            self._keys.clear()
+            self._memory.clear()
+            self._disk_bytes = self._memory_bytes = 0
+            self.memory_hits = self.disk_hits = self.misses = self.evictions = 0
+            self._compact()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._index),
+                'files': len(self._blobs),
+                'disk_bytes': self._disk_bytes,
+                'disk_budget': self.disk_budget,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = load_config()
+            _cache = ThumbnailCache(THUMB_CACHE_DIR,
+                                    disk_budget=config['thumbnail_cache_mb'] * 1024 * 1024)
+        return _cache
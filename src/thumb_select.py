@@ -0,0 +1,39 @@
+import re
+
+# Tamaños a los que se muestran: resultado de la búsqueda y tarjetas del historial
+SEARCH_SIZE = (160, 90)
+HISTORY_SIZE = (96, 54)
+
+# Miniaturas de YouTube por nombre, para las entradas de yt-dlp que no traen su tamaño
+_YOUTUBE_SIZES = {
+    'default': (120, 90), 'mqdefault': (320, 180), 'hqdefault': (480, 360),
+    'sddefault': (640, 480), 'hq720': (1280, 720), 'maxresdefault': (1280, 720),
+}
+_YOUTUBE_NAME_RE = re.compile(
+    r'/(default|mqdefault|hqdefault|sddefault|hq720|maxresdefault)(?:_live)?\.(?:jpg|webp)')
+_JPEG_RE = re.compile(r'\.jpe?g(?:$|\?)', re.IGNORECASE)
+
+
+def _thumbnail_size(thumb: dict):
+    if thumb.get('width') and thumb.get('height'):
+        return thumb['width'], thumb['height']
+    match = _YOUTUBE_NAME_RE.search(thumb.get('url') or '')
+    return _YOUTUBE_SIZES[match.group(1)] if match else None
+
+
+def pick_thumbnail(thumbnails: list, width: int, height: int, fallback: str = '') -> str:
+    # La variante más pequeña que cubre width x height (el recorte al centro nunca baja de ahí),
+    # con JPEG por delante a igual tamaño: se puede decodificar reducida. Si ninguna de tamaño
+    # conocido llega, la de yt-dlp (fallback), que suele ser la mayor
+    sized = []
+    for thumb in thumbnails or []:
+        size = _thumbnail_size(thumb)
+        if thumb.get('url') and size:
+            sized.append((size[0] * size[1], not _JPEG_RE.search(thumb['url']), thumb['url'],
+                          size))
+    covering = [t for t in sized if t[3][0] >= width and t[3][1] >= height]
+    if covering:
+        return min(covering)[2]
+    if fallback:
+        return fallback
+    return max(sized, key=lambda t: (t[0], not t[1]))[2] if sized else ''
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import threading
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+# Miniaturas en curso a la vez; también es el tamaño del pool de conexiones de la sesión
+DEFAULT_WORKERS = 4
+TIMEOUT = 5
+
+# Prioridades (menor = antes): la de la búsqueda, las filas a la vista y el resto
+PRIORITY_URGENT = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_BACKGROUND = 2
+
+
+def crop_resize(img: Image.Image, width: int, height: int) -> Image.Image:
+    # Recorte centrado a la proporción de destino y escalado final
+    target_ratio = width / height
+    orig_w, orig_h = img.size
+    orig_ratio = orig_w / orig_h
+    if orig_ratio > target_ratio:
+        new_w = int(orig_h * target_ratio)
+        left = (orig_w - new_w) // 2
+        img = img.crop((left, 0, left + new_w, orig_h))
+    elif orig_ratio < target_ratio:
+        new_h = int(orig_w / target_ratio)
+        top = (orig_h - new_h) // 2
+        img = img.crop((0, top, orig_w, top + new_h))
+    return img.resize((width, height), Image.LANCZOS)
+
+
+class _Request:
+    def __init__(self, key: tuple, priority: int, cached: bool):
+        self.key = key
+        self.priority = priority
+        # Ya en la caché de disco: va antes que las que necesitan la red con su misma prioridad
+        self.cached = cached
+        self.seq = 0
+        # (callback, alive): todos los que esperan la misma URL y tamaño
+        self.waiters = []
+
+
+class ThumbnailLoader:
+    # Descarga miniaturas con una sesión keep-alive y pocos hilos fijos, en vez de un hilo y
+    # una conexión por imagen. Las peticiones repetidas se juntan, las de widgets que ya no
+    # existen se descartan y las filas a la vista pasan delante.
+    # schedule(ms, fn) lleva la entrega al hilo de la interfaz (Tk.after); alive() se consulta
+    # desde los hilos del cargador, así que no debe llamar a Tk. Con cache (ThumbnailCache) las
+    # miniaturas ya vistas no vuelven a descargarse ni a escalarse
+    def __init__(self, schedule, workers: int = DEFAULT_WORKERS, cache=None):
+        self.schedule = schedule
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._pending = {}
+        self._in_flight = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._threads = []
+        self._cond = threading.Condition()
+        self.stats = {'requested': 0, 'merged': 0, 'dropped': 0, 'fetched': 0, 'failed': 0}
+
+    def request(self, url: str, width: int, height: int, callback, alive=None,
+                priority: int = PRIORITY_BACKGROUND) -> tuple:
+        # callback(img) recibe la imagen PIL ya recortada, en el hilo de la interfaz
+        key = (url, width, height)
+        img = self.cache.get_memory(url, width, height) if self.cache else None
+        if img is not None:
+            self.schedule(0, lambda: self._deliver([(callback, alive)], img))
+            return key
+        cached = bool(self.cache and self.cache.contains(url, width, height))
+        with self._cond:
+            self.stats['requested'] += 1
+            request = self._in_flight.get(key) or self._pending.get(key)
+            if request is not None:
+                self.stats['merged'] += 1
+                request.waiters.append((callback, alive))
+                if key in self._pending and priority < request.priority:
+                    self._push(request, priority)
+                return key
+            request = self._pending[key] = _Request(key, priority, cached)
+            request.waiters.append((callback, alive))
+            self._push(request, priority)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="thumbnail-loader",
+                                          daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return key
+
+    def prioritize(self, keys):
+        # Las claves dadas pasan a visibles; las que lo eran y ya no están, al fondo
+        keys = set(keys)
+        with self._cond:
+            for key, request in self._pending.items():
+                if key in keys and request.priority > PRIORITY_VISIBLE:
+                    self._push(request, PRIORITY_VISIBLE)
+                elif key not in keys and request.priority == PRIORITY_VISIBLE:
+                    self._push(request, PRIORITY_BACKGROUND)
+
+    def _push(self, request: _Request, priority: int):
+        # Las entradas anteriores del montículo quedan obsoletas (seq distinto) y se saltan
+        request.priority = priority
+        request.seq = next(self._seq)
+        heapq.heappush(self._heap, (priority, not request.cached, request.seq, request.key))
+
+    def _next(self):
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, seq, key = heapq.heappop(self._heap)
+                request = self._pending.get(key)
+                if request is None or request.seq != seq:
+                    continue
+                del self._pending[key]
+                request.waiters = [w for w in request.waiters if _is_alive(w[1])]
+                if not request.waiters:
+                    self.stats['dropped'] += 1
+                    continue
+                self._in_flight[key] = request
+                return request
+
+    def _work(self):
+        while True:
+            request = self._next()
+            try:
+                img = self._load(*request.key)
+            except Exception:
+                img = None
+            with self._cond:
+                del self._in_flight[request.key]
+                waiters = request.waiters
+                self.stats['fetched' if img is not None else 'failed'] += 1
+            if img is not None:
+                self.schedule(0, lambda: self._deliver(waiters, img))
+
+    def _load(self, url: str, width: int, height: int) -> Image.Image:
+        if self.cache:
+            img = self.cache.get(url, width, height)
+            if img is not None:
+                return img
+        response = self.session.get(url, timeout=TIMEOUT)
+        response.raise_for_status()
+        img = Image.open(BytesIO(response.content))
+        # JPEG: decodifica directamente a 1/2, 1/4 o 1/8 sin bajar del tamaño de destino
+        img.draft("RGB", (width, height))
+        img = crop_resize(img.convert("RGB"), width, height)
+        if self.cache:
+            self.cache.put(url, width, height, response.content, img)
+        return img
+
+    @staticmethod
+    def _deliver(waiters: list, img: Image.Image):
+        for callback, alive in waiters:
+            if _is_alive(alive):
+                callback(img)
+
+
+def _is_alive(alive) -> bool:
+    try:
+        return alive is None or bool(alive())
+    except Exception:
+        return False
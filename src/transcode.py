@@ -0,0 +1,205 @@
+import os
+import shutil
+import subprocess
+import time
+
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+from config import load_config
+from planner import can_copy, stream_plan, COST_REMUX
+from segment_encode import SegmentEncoder, MIN_PARALLEL_DURATION
+
+# Codec de yt-dlp (codec_map de downloader) -> (extensión, encoder de ffmpeg, argumentos extra)
+FFMPEG_AUDIO = {
+    'mp3':    ('mp3',  'libmp3lame', []),
+    'aac':    ('aac',  'aac',        ['-f', 'adts']),
+    'flac':   ('flac', 'flac',       []),
+    'vorbis': ('ogg',  'libvorbis',  []),
+    'wav':    ('wav',  'pcm_s16le',  []),
+    'm4a':    ('m4a',  'aac',        []),
+}
+
+# Avisos de progreso como mucho cada este intervalo por objetivo
+PROGRESS_INTERVAL = 0.25
+
+
+def ffmpeg_executable(ffmpeg_location: str = None) -> str:
+    if ffmpeg_location:
+        found = shutil.which('ffmpeg', path=ffmpeg_location)
+        if found:
+            return found
+    return shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def target_extension(codec: str) -> str:
+    return FFMPEG_AUDIO[codec][0]
+
+
+def audio_args(codec: str, quality: str, copy: bool = False) -> list:
+    _, encoder, extra = FFMPEG_AUDIO[codec]
+    # Copia del stream: el audio no se toca y la calidad es la del original
+    args = ['-vn', '-c:a', 'copy' if copy else encoder] + extra
+    # '0' en codec_map indica formato sin pérdida: no se fija bitrate
+    if not copy and quality and quality != '0':
+        args += ['-b:a', f'{quality}k']
+    return args
+
+
+def build_command(ffmpeg: str, source: str, target: str, codec: str, quality: str,
+                  copy: bool = False) -> list:
+    return ([ffmpeg, '-y', '-nostdin', '-hide_banner', '-loglevel', 'error', '-i', source]
+            + audio_args(codec, quality, copy) + ['-progress', 'pipe:1', target])
+
+
+def transcode_audio(source: str, target: str, codec: str, quality: str,
+                    ffmpeg_location: str = None, duration: float = None,
+                    progress_queue=None, target_id=None, source_codec: str = None,
+                    cancel_event=None) -> dict:
+    # Se ejecuta en un proceso del pool: solo recibe y devuelve datos serializables
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    if cancelled():
+        # Ya en la cola del pool cuando se canceló: Future.cancel() no llega a tiempo
+        raise RuntimeError("Conversión cancelada")
+    start = time.time()
+    copy = can_copy(codec, source_codec)
+    base, ext = os.path.splitext(target)
+    temp_path = f'{base}.temp{ext}'
+    cmd = build_command(ffmpeg_executable(ffmpeg_location), source, temp_path, codec, quality,
+                        copy)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    if progress_queue is not None:
+        # El proceso principal lo mata directamente si se cancela
+        progress_queue.put(('pid', target_id, proc.pid))
+    # Cancelado antes de que el proceso principal viera el pid: no lo va a matar él
+    if cancelled():
+        proc.kill()
+    last_report = 0
+    for line in proc.stdout:
+        key, _, value = line.strip().partition('=')
+        # out_time_ms también viene en microsegundos
+        if key in ('out_time_us', 'out_time_ms') and value.isdigit() and duration:
+            now = time.time()
+            if progress_queue is not None and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                percentage = min(100.0, int(value) / 1e6 / duration * 100)
+                progress_queue.put(('progress', target_id, percentage))
+        elif key == 'progress' and cancelled():
+            # Una vez por bloque de progreso de ffmpeg
+            proc.kill()
+    stderr = proc.stderr.read()
+    if proc.wait() != 0 or cancelled():
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        if cancelled():
+            raise RuntimeError("Conversión cancelada")
+        raise RuntimeError(f"ffmpeg falló ({codec}): {stderr.strip() or proc.returncode}")
+    os.replace(temp_path, target)
+    if progress_queue is not None:
+        progress_queue.put(('progress', target_id, 100.0))
+    return {
+        'file_path': target,
+        'size_mb': round(os.path.getsize(target) / (1024 * 1024), 2),
+        'elapsed_seconds': round(time.time() - start, 1),
+        'transcoded': not copy,
+    }
+
+
+class AudioConvertPP(FFmpegPostProcessor):
+    # Sustituye a FFmpegExtractAudio: copia el stream si el codec descargado ya vale
+    def __init__(self, codec: str, quality: str, downloader=None):
+        super().__init__(downloader)
+        self.codec = codec
+        self.quality = quality
+        # Extensión del resultado (y de su temporal .temp.ext)
+        self.target_ext = target_extension(codec)
+        self.transcoded = None
+
+    def set_downloader(self, downloader):
+        super().set_downloader(downloader)
+        # ffmpeg_location llega con el YoutubeDL, que se asigna después de __init__
+        self._paths = self._determine_executables()
+
+    def run(self, info):
+        path = info['filepath']
+        source_codec = self.get_audio_codec(path)
+        copy = can_copy(self.codec, source_codec)
+        ext = self.target_ext
+        base = os.path.splitext(path)[0]
+        new_path = f'{base}.{ext}'
+        temp_path = f'{base}.temp.{ext}'
+        action = 'Copiando' if copy else 'Convirtiendo'
+        self.to_screen(f"{action} audio ({source_codec} -> {self.codec}): {new_path}")
+        self.run_ffmpeg(path, temp_path, audio_args(self.codec, self.quality, copy))
+        os.replace(temp_path, new_path)
+        self.transcoded = not copy
+        info['filepath'] = new_path
+        info['ext'] = ext
+        # El original se borra salvo que coincida con el resultado
+        return ([] if new_path == path else [path]), info
+
+
+# Encoders cuando un stream no cabe por copia en el contenedor: (vídeo, audio)
+VIDEO_ENCODERS = {
+    'mp4':  ('libx264', 'aac'),
+    'mov':  ('libx264', 'aac'),
+    'avi':  ('libx264', 'libmp3lame'),
+    'webm': ('libvpx-vp9', 'libopus'),
+    'mkv':  ('libx264', 'aac'),
+}
+
+
+class VideoConvertPP(FFmpegPostProcessor):
+    # Lleva el resultado de la mezcla al contenedor pedido recodificando solo lo necesario
+    def __init__(self, container: str, progress_callback=None, cancel_check=None,
+                 downloader=None):
+        super().__init__(downloader)
+        self.container = container
+        self.target_ext = container
+        self.progress_callback = progress_callback
+        self.cancel_check = cancel_check
+        self.cost = None
+        self.transcoded = None
+        self.segments = None
+
+    def set_downloader(self, downloader):
+        super().set_downloader(downloader)
+        self._paths = self._determine_executables()
+
+    def run(self, info):
+        path = info['filepath']
+        if info.get('ext') == self.container:
+            self.cost, self.transcoded = COST_REMUX, False
+            return [], info
+        streams = stream_plan(self.container, info.get('vcodec'), info.get('acodec'))
+        video_encoder, audio_encoder = VIDEO_ENCODERS[self.container]
+        video_args = ['-c:v', 'copy' if streams['copy_video'] else video_encoder]
+        audio_args = ['-c:a', 'copy' if streams['copy_audio'] else audio_encoder]
+        base = os.path.splitext(path)[0]
+        new_path = f'{base}.{self.container}'
+        temp_path = f'{base}.temp.{self.container}'
+        self.to_screen(f"Pasando a {self.container} ({streams['cost']}): {new_path}")
+        workers = load_config()['transcode_workers'] or os.cpu_count() or 1
+        duration = info.get('duration')
+        if not streams['copy_video'] and workers > 1 and (duration or 0) >= MIN_PARALLEL_DURATION:
+            # Recodificación por tramos en paralelo; el audio va aparte y se une al final
+            encoder = SegmentEncoder(
+                path, temp_path, video_args,
+                audio_args if info.get('acodec') not in (None, 'none') else None,
+                duration=duration, workers=workers, ffmpeg=self.executable,
+                ffprobe=self.probe_executable or 'ffprobe',
+                progress_callback=self.progress_callback, cancel_check=self.cancel_check)
+            self.segments = encoder.run()
+        else:
+            self.run_ffmpeg(path, temp_path, ['-map', '0:v:0?', '-map', '0:a:0?']
+                            + video_args + audio_args)
+        os.replace(temp_path, new_path)
+        self.cost = streams['cost']
+        self.transcoded = streams['cost'] != COST_REMUX
+        info['filepath'] = new_path
+        info['ext'] = self.container
+        return [path], info
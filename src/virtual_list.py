@@ -0,0 +1,170 @@
+import sys
+from collections import OrderedDict
+
+import customtkinter as ctk
+
+# Filas extra por encima y por debajo de la vista, para que al desplazarse ya estén montadas
+OVERSCAN = 3
+# Entradas por consulta y páginas que se guardan en memoria
+PAGE_SIZE = 50
+MAX_PAGES = 8
+# Píxeles (sin escalar) por paso de la rueda del ratón
+WHEEL_STEP = 60
+
+
+class VirtualList(ctk.CTkFrame):
+    # Lista de filas de alto fijo que solo crea widgets para las visibles (más OVERSCAN) y los
+    # reutiliza al desplazarse: el coste no depende del número de filas.
+    # count() da el total y las páginas se piden por clave, no por posición: cada entrada lleva
+    # 'id', fetch(before, limit) devuelve las que siguen a la de id 'before' (None: desde el
+    # principio) y seek(before, skip) el id de la que va 'skip' posiciones después, para saltar
+    # a una página sin leer las anteriores. create_row(parent) devuelve un dict con al menos
+    # 'frame' (creado con el alto de la fila) y bind_row(row, entry) lo rellena.
+    # on_visible(rows) recibe las filas a la vista tras cada cambio
+    def __init__(self, master, row_height: int, create_row, bind_row, count, fetch, seek,
+                 on_visible=None, empty_text: str = "", **kwargs):
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.count = count
+        self.fetch = fetch
+        self.seek = seek
+        self.on_visible = on_visible
+        self._top = 0
+        self._total = 0
+        self._pages = OrderedDict()
+        # Página -> id de la última entrada de la anterior; solo enteros, se guardan todas
+        self._anchors = {0: None}
+        self._rows = {}
+        self._free = []
+        # Etiqueta propia para la rueda: bind_all la comparten todos los CTkScrollableFrame
+        self._tag = f"VirtualList{id(self)}"
+
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self._viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self._viewport.grid(row=0, column=0, sticky="nsew")
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self._scrollbar.grid(row=0, column=1, sticky="ns", padx=(2, 0))
+        self._empty = ctk.CTkLabel(self._viewport, text=empty_text, anchor="w")
+
+        if sys.platform.startswith("linux"):
+            self.bind_class(self._tag, "<Button-4>", self._on_wheel)
+            self.bind_class(self._tag, "<Button-5>", self._on_wheel)
+        else:
+            self.bind_class(self._tag, "<MouseWheel>", self._on_wheel)
+        self._add_tag(self._viewport)
+        self._viewport.bind("<Configure>", lambda event: self._layout())
+
+    def _add_tag(self, widget):
+        widget.bindtags((self._tag,) + widget.bindtags())
+        for child in widget.winfo_children():
+            self._add_tag(child)
+
+    def _viewport_height(self) -> int:
+        return self._reverse_widget_scaling(self._viewport.winfo_height())
+
+    def refresh(self):
+        # Los datos han cambiado: se vuelven a pedir y todas las filas se rellenan de nuevo
+        self._total = self.count()
+        self._pages.clear()
+        self._anchors = {0: None}
+        for row in self._rows.values():
+            row['frame'].place_forget()
+            self._free.append(row)
+        self._rows.clear()
+        # Con menos filas (p. ej. tras limpiar) la posición anterior puede quedar fuera
+        limit = max(0, self._total * self.row_height - self._viewport_height())
+        self._top = min(self._top, limit)
+        self._layout()
+
+    def scroll_to(self, top: int):
+        limit = max(0, self._total * self.row_height - self._viewport_height())
+        top = max(0, min(int(top), limit))
+        if top != self._top:
+            self._top = top
+            self._layout()
+
+    def _anchor(self, page: int):
+        if page in self._anchors:
+            return self._anchors[page]
+        # Salto sin haber leído las páginas anteriores: se parte de la conocida más cercana
+        known = max(p for p in self._anchors if p < page)
+        anchor = self.seek(self._anchors[known], (page - known) * PAGE_SIZE - 1)
+        if anchor is not None:
+            self._anchors[page] = anchor
+        return anchor
+
+    def _entry(self, index: int):
+        page = index // PAGE_SIZE
+        entries = self._pages.get(page)
+        if entries is None:
+            anchor = self._anchor(page)
+            entries = [] if anchor is None and page else self.fetch(anchor, PAGE_SIZE)
+            self._pages[page] = entries
+            if len(entries) == PAGE_SIZE:
+                self._anchors[page + 1] = entries[-1]['id']
+            while len(self._pages) > MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page)
+        offset = index - page * PAGE_SIZE
+        return entries[offset] if offset < len(entries) else None
+
+    def _layout(self):
+        height = self._viewport_height()
+        if self._total == 0:
+            self._empty.place(x=10, y=20)
+        else:
+            self._empty.place_forget()
+        first_visible = self._top // self.row_height
+        last_visible = min(self._total, (self._top + height) // self.row_height + 1)
+        first = max(0, first_visible - OVERSCAN)
+        last = min(self._total, last_visible + OVERSCAN)
+
+        for index in [i for i in self._rows if i < first or i >= last]:
+            row = self._rows.pop(index)
+            row['frame'].place_forget()
+            self._free.append(row)
+        for index in range(first, last):
+            row = self._rows.get(index)
+            if row is None:
+                entry = self._entry(index)
+                if entry is None:
+                    continue
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = self.create_row(self._viewport)
+                    self._add_tag(row['frame'])
+                self.bind_row(row, entry)
+                self._rows[index] = row
+            row['frame'].place(x=0, y=index * self.row_height - self._top, relwidth=1)
+
+        content = self._total * self.row_height
+        if content <= height:
+            self._scrollbar.set(0, 1)
+        else:
+            self._scrollbar.set(self._top / content, (self._top + height) / content)
+        if self.on_visible:
+            self.on_visible([self._rows[i] for i in range(first_visible, last_visible)
+                             if i in self._rows])
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * self._total * self.row_height)
+        elif action == "scroll":
+            step = self._viewport_height() if unit == "pages" else WHEEL_STEP
+            self.scroll_to(self._top + int(value) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            steps = -1
+        elif event.num == 5:
+            steps = 1
+        elif sys.platform == "darwin":
+            steps = -event.delta
+        else:
+            steps = -event.delta / 120
+        self.scroll_to(self._top + steps * WHEEL_STEP)
@@ -0,0 +1,244 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bandwidth import Allocation, current_allocation, use_allocation, REBALANCE_INTERVAL
+from cancel import DownloadCancelled, use_token
+from downloader import get_video_info
+from fragments import BrokeredBudget, get_connection_budget, use_connection_budget
+from info_cache import get_info_cache, video_key
+from job_queue import Job, run_download_job
+
+# Cada cuánto mira el proceso principal si el trabajo se ha cancelado
+POLL_INTERVAL = 0.1
+# Avisos de progreso del worker como mucho cada este intervalo (cada uno es un mensaje entre procesos)
+PROGRESS_INTERVAL = 0.1
+# Procesos solo para búsquedas: las descargas ocupan los suyos durante minutos
+SEARCH_PROCESSES = 1
+
+
+def _watch_parent(job: Job, allocation: Allocation, budget: BrokeredBudget, events, cancel_event,
+                  rate_value, connections_value, finished: threading.Event):
+    # El reparto del ancho de banda y de las conexiones se hace en el proceso principal: desde
+    # aquí se informa del uso real y de las conexiones que se quieren, y se aplica lo que asigne
+    last_sample = time.monotonic()
+    demand_sent = 0
+    while not finished.is_set():
+        if cancel_event.wait(POLL_INTERVAL):
+            job.cancel()
+            return
+        demand = budget.demand()
+        if demand != demand_sent:
+            demand_sent = demand
+            events.put(('connections', demand))
+        budget.resize(connections_value.value)
+        now = time.monotonic()
+        if now - last_sample >= REBALANCE_INTERVAL:
+            events.put(('bandwidth', allocation.take_usage(now - last_sample)))
+            last_sample = now
+            allocation.set_rate(rate_value.value)
+
+
+def _run_job(fields: dict, events, cancel_event, rate_value, connections_value) -> dict:
+    # Se ejecuta en el worker: el Job es una copia y lo que cambia se envía por la cola de eventos
+    job = Job(**fields)
+    allocation = Allocation(job.weight, rate_value.value)
+    budget = BrokeredBudget()
+    finished = threading.Event()
+    threading.Thread(target=_watch_parent, daemon=True,
+                     args=(job, allocation, budget, events, cancel_event, rate_value,
+                           connections_value, finished)).start()
+    last_report = 0
+    plan_sent = False
+
+    def progress_callback(percentage, speed):
+        nonlocal last_report, plan_sent
+        if job.plan is not None and not plan_sent:
+            plan_sent = True
+            events.put(('plan', job.plan))
+        now = time.time()
+        if percentage < 100 and now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        events.put(('progress', percentage, speed, job.postprocess_progress))
+
+    def file_callback(path):
+        events.put(('file', path))
+
+    try:
+        with use_token(job.token), use_allocation(allocation), use_connection_budget(budget):
+            return run_download_job(job, progress_callback, file_callback)
+    except DownloadCancelled:
+        raise
+    except Exception as e:
+        # Las excepciones de yt-dlp no siempre se pueden serializar de vuelta
+        raise RuntimeError(str(e)) from None
+    finally:
+        finished.set()
+
+
+def _fetch_info(url: str):
+    try:
+        summary = get_video_info(url, use_cache=False)
+    except Exception as e:
+        raise RuntimeError(str(e)) from None
+    return summary, get_info_cache().get_raw(video_key(url))
+
+
+class WorkerPool:
+    # Ejecuta descargas y extracciones en procesos aparte: yt-dlp no retiene el GIL de la interfaz
+    def __init__(self, processes: int):
+        self.processes = max(1, processes)
+        self._context = multiprocessing.get_context('spawn')
+        self._manager = None
+        self._executor = None
+        self._search_executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self._manager is None:
+                    self._manager = self._context.Manager()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=self._context)
+            return self._executor, self._manager
+
+    def _search_pool(self):
+        with self._lock:
+            if self._search_executor is None:
+                self._search_executor = ProcessPoolExecutor(
+                    max_workers=SEARCH_PROCESSES, mp_context=self._context)
+            return self._search_executor
+
+    def _discard(self, executor):
+        # Un worker muerto rompe el pool entero: el siguiente trabajo crea otro
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            if self._search_executor is executor:
+                self._search_executor = None
+        executor.shutdown(wait=False)
+
+    def resize(self, processes: int):
+        processes = max(1, processes)
+        with self._lock:
+            if processes == self.processes:
+                return
+            self.processes = processes
+            old, self._executor = self._executor, None
+        # Los trabajos en marcha terminan en el pool anterior; los nuevos van al siguiente
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def run_job(self, job: Job, progress_callback, file_callback=None) -> dict:
+        # Mismo contrato que run_download_job: sirve como runner de DownloadQueue
+        executor, manager = self._pool()
+        events = manager.Queue()
+        cancel_event = manager.Event()
+        info = job.info
+        if info is None:
+            # La extracción de la búsqueda vive en la caché de este proceso, no en la del worker
+            info = get_info_cache().get_raw(video_key(job.url))
+        fields = {
+            'url': job.url, 'quality': job.quality, 'output_format': job.output_format,
+            'output_path': job.output_path, 'title': job.title, 'info': info,
+            'playlist_index': job.playlist_index, 'journal_id': job.journal_id,
+            'weight': job.weight,
+        }
+        # Parte del límite global que DownloadQueue asignó a este trabajo (0 = sin límite)
+        allocation = current_allocation()
+        rate_value = manager.Value('d', (allocation and allocation.rate) or 0)
+        # Conexiones concedidas del presupuesto de este proceso, que es el de todos los workers
+        connections_value = manager.Value('i', 0)
+        try:
+            return self._wait_job(job, executor, fields, events, cancel_event, allocation,
+                                  rate_value, connections_value, progress_callback,
+                                  file_callback)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    def _wait_job(self, job: Job, executor, fields: dict, events, cancel_event, allocation,
+                  rate_value, connections_value, progress_callback, file_callback) -> dict:
+        future = executor.submit(_run_job, fields, events, cancel_event, rate_value,
+                                 connections_value)
+        budget = get_connection_budget()
+        cancel_sent = False
+        rate_sent = rate_value.value
+        held = demand = 0
+        try:
+            while True:
+                if job.cancelled and not cancel_sent:
+                    cancel_sent = True
+                    cancel_event.set()
+                    # Aún en la cola del pool: no llega a arrancar
+                    future.cancel()
+                if allocation and (allocation.rate or 0) != rate_sent:
+                    rate_sent = rate_value.value = allocation.rate or 0
+                if demand != held:
+                    # Si no hay libres se reintenta en la siguiente vuelta, cuando otro suelte
+                    granted = budget.regrant(held, demand)
+                    if granted != held:
+                        held = connections_value.value = granted
+                try:
+                    event = events.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    # Los eventos se encolan antes de que termine el trabajo: vacía = no quedan
+                    if future.done():
+                        break
+                    continue
+                kind = event[0]
+                if kind == 'progress':
+                    _, percentage, speed, job.postprocess_progress = event
+                    progress_callback(percentage, speed)
+                elif kind == 'plan':
+                    job.plan = event[1]
+                elif kind == 'bandwidth' and allocation:
+                    if event[1] is not None:
+                        allocation.report(event[1])
+                elif kind == 'connections':
+                    demand = event[1]
+                elif kind == 'file' and file_callback:
+                    file_callback(event[1])
+        finally:
+            budget.release(held)
+        if future.cancelled():
+            raise DownloadCancelled()
+        return future.result()
+
+    def fetch_info(self, url: str) -> dict:
+        # get_video_info en un proceso propio de las búsquedas, que nunca espera a que termine
+        # una descarga; el resultado se guarda en la caché de este proceso
+        cache = get_info_cache()
+        key = video_key(url)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        executor = self._search_pool()
+        try:
+            summary, raw = executor.submit(_fetch_info, url).result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        cache.put(key, summary)
+        if raw is not None:
+            cache.put_raw(key, raw)
+        return summary
+
+    def shutdown(self):
+        # Al cerrar no se cancela nada: como antes con los hilos, las descargas se cortan sin
+        # tocar el diario ni los .part y se pueden reanudar en el siguiente arranque
+        with self._lock:
+            executors = [self._executor, self._search_executor]
+            self._executor = self._search_executor = None
+        for executor in executors:
+            if executor is None:
+                continue
+            # ProcessPoolExecutor no ofrece otra forma de parar los workers ocupados
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)